@@ -0,0 +1,67 @@
+import hashlib
+import json
+import os
+import pickle
+from typing import Any, Dict, Optional
+
+cache_format_version = 3  # Bump when the cached structure changes so old caches are ignored
+
+def alignment_cache_path(fasta_file_path: str, cache_name: str = 'parsed') -> str:
+    """Return the cache file stored next to an .mma alignment."""
+    return f"{fasta_file_path}.{cache_name}.pickle"
+
+def file_fingerprint(file_path: str, previous: Optional[Dict] = None) -> Optional[Dict]:
+    """Return size, mtime and sha256 of a file, reusing the previous hash when size and mtime match."""
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    if previous and previous.get("size") == stat.st_size and previous.get("mtime") == stat.st_mtime_ns:
+        return previous
+
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return {"size": stat.st_size, "mtime": stat.st_mtime_ns, "sha256": digest.hexdigest()}
+
+def load_manifest(manifest_path: str) -> Dict:
+    """Load a JSON state file such as the incremental build manifest, or an empty one."""
+    try:
+        with open(manifest_path, 'r') as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_manifest(manifest: Dict, manifest_path: str) -> None:
+    """Write a JSON state file."""
+    with open(manifest_path, 'w') as file:
+        json.dump(manifest, file, indent=4, sort_keys=True)
+
+def load_alignment_cache(fasta_file_path: str, cache_name: str = 'parsed') -> Optional[Any]:
+    """Return the cached parse of an alignment, or None if it is missing or the source changed."""
+    cache_path = alignment_cache_path(fasta_file_path, cache_name)
+    if not os.path.exists(cache_path) or not os.path.exists(fasta_file_path):
+        return None
+    try:
+        with open(cache_path, 'rb') as file:
+            cached = pickle.load(file)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+        return None
+    if not isinstance(cached, dict) or cached.get("version") != cache_format_version:
+        return None
+    if cached.get("sha256") != file_fingerprint(fasta_file_path)["sha256"]:
+        return None
+    return cached["data"]
+
+def save_alignment_cache(fasta_file_path: str, data: Any, cache_name: str = 'parsed') -> None:
+    """Store a parsed alignment next to its source, keyed on the source file hash."""
+    cache_path = alignment_cache_path(fasta_file_path, cache_name)
+    cached = {"version": cache_format_version, "sha256": file_fingerprint(fasta_file_path)["sha256"], "data": data}
+    try:
+        tmp_path = f"{cache_path}.tmp"
+        with open(tmp_path, 'wb') as file:
+            pickle.dump(cached, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"Warning: Could not write alignment cache {cache_path}: {e}")
@@ -0,0 +1,104 @@
+import argparse
+from typing import Dict, List
+
+import numpy as np
+
+OPEN_PAREN = ord('(')
+CLOSE_PAREN = ord(')')
+GAP = ord('-')
+
+def sequence_bytes(sequence: str) -> np.ndarray:
+    """View an aligned sequence as a uint8 array."""
+    return np.frombuffer(sequence.encode('ascii'), dtype=np.uint8)
+
+def extract_alignment_info(sequence: str) -> tuple:
+    """Vectorized extract_sequence_info that also returns the kinase domain alignment string."""
+    chars = sequence_bytes(sequence)
+    is_open = chars == OPEN_PAREN
+    is_close = chars == CLOSE_PAREN
+    is_paren = is_open | is_close
+
+    # Flanking state of each character is set by the last parenthesis before it
+    paren_index = np.where(is_paren, np.arange(chars.size), -1)
+    last_paren = np.maximum.accumulate(paren_index) if chars.size else paren_index
+    inside = (last_paren >= 0) & is_open[np.maximum(last_paren, 0)]
+
+    # Position counter as seen by each character: 1 + non-parenthesis characters before it
+    counted = ~is_paren
+    pos_before = np.cumsum(counted) - counted + 1
+    total_pos = int(counted.sum()) + 1
+
+    domain_mask = counted & ~inside
+    domain_chars = chars[domain_mask]
+    kinase_domain = domain_chars.tobytes().decode('ascii')
+    is_aligned = ((domain_chars >= ord('A')) & (domain_chars <= ord('Z'))) | (domain_chars == GAP)
+    kinase_domain_alignment = domain_chars[is_aligned].tobytes().decode('ascii')
+
+    # Parentheses are few per sequence, so their bookkeeping stays in Python
+    flanking_positions = []
+    domain_seen = np.cumsum(domain_mask) - domain_mask > 0
+    kinase_end = -1
+    start_pos = -1
+    for i in np.flatnonzero(is_paren).tolist():
+        pos = int(pos_before[i])
+        if is_open[i]:
+            start_pos = pos
+            if domain_seen[i]:
+                kinase_end = pos - 1
+        else:
+            flanking_positions.append({"start": start_pos, "end": pos - 1})
+    if kinase_end == -1:
+        kinase_end = total_pos - 1
+
+    # Kinase start is fixed by the first domain character or closing parenthesis
+    starts = np.flatnonzero(domain_mask | is_close)
+    kinase_start = int(pos_before[starts[0]]) if starts.size else -1
+
+    return flanking_positions, kinase_domain, kinase_start, kinase_end, kinase_domain_alignment
+
+def build_column_matrix(uniprot_info: Dict) -> tuple:
+    """Stack every kinase domain alignment into a proteins x alignment columns uint8 matrix."""
+    uniprot_ids = list(uniprot_info)
+    alignments = [uniprot_info[uniprot_id]["kinase_domain_alignment"]["sequence"] for uniprot_id in uniprot_ids]
+    width = max((len(alignment) for alignment in alignments), default=0)
+    matrix = np.full((len(alignments), width), GAP, dtype=np.uint8)
+    for row, alignment in enumerate(alignments):
+        matrix[row, :len(alignment)] = sequence_bytes(alignment)
+    return uniprot_ids, matrix
+
+def check_equivalence(uniprot_info: Dict) -> List[str]:
+    """Compare the vectorized extraction with extract_sequence_info and return mismatching Uniprot IDs."""
+    from kinsnps_allinfo import extract_sequence_info
+
+    mismatches = []
+    for uniprot_id, protein in uniprot_info.items():
+        sequence = protein["sequence"]
+        flanking_positions, kinase_domain, kinase_start, kinase_end = extract_sequence_info(sequence)
+        expected = (flanking_positions, kinase_domain, kinase_start, kinase_end,
+                    ''.join(c for c in kinase_domain if c.isupper() or c == '-'))
+        if extract_alignment_info(sequence) != expected:
+            mismatches.append(uniprot_id)
+    return mismatches
+
+if __name__ == "__main__":
+    from kinsnps_allinfo import parse_fasta_file
+
+    parser = argparse.ArgumentParser(description="Vectorized alignment column extraction")
+    parser.add_argument('--input', '-i', type=str, default='./kinsnps/human_kinases.mma',
+                      help='Path to the .mma alignment')
+    parser.add_argument('--matrix', '-m', type=str, default=None,
+                      help='Save the proteins x alignment columns matrix to this .npz file')
+    args = parser.parse_args()
+
+    uniprot_info = parse_fasta_file(args.input, use_cache=False)
+
+    mismatches = check_equivalence(uniprot_info)
+    if mismatches:
+        print(f"Vectorized extraction differs for {len(mismatches)} proteins: {', '.join(mismatches)}")
+    else:
+        print(f"Vectorized extraction matches extract_sequence_info for all {len(uniprot_info)} proteins")
+
+    if args.matrix:
+        uniprot_ids, matrix = build_column_matrix(uniprot_info)
+        np.savez_compressed(args.matrix, uniprot_ids=np.array(uniprot_ids), matrix=matrix)
+        print(f"Saved {matrix.shape[0]} x {matrix.shape[1]} column matrix to {args.matrix}")
@@ -0,0 +1,104 @@
+import argparse
+import json
+import os
+from typing import Dict, Iterable, List, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from kinsnps_allinfo import substitution_sources
+
+substitutions_schema = pa.schema([
+    ("uniprot_id", pa.string()),
+    ("full_sequence_pos", pa.int32()),
+    ("alignment_pos", pa.int32()),  # Null for substitutions outside of the alignment
+    ("from", pa.string()),
+    ("to", pa.string()),
+    ("location", pa.string()),
+    ("database", pa.string()),
+    ("count", pa.int32()),  # Times the database reported the change; merged records have one row per database
+])
+
+proteins_schema = pa.schema([
+    ("uniprot_id", pa.string()),
+    ("sequence", pa.string()),
+    ("kinase_domain_sequence", pa.string()),
+    ("kinase_domain_start", pa.int32()),
+    ("kinase_domain_end", pa.int32()),
+    ("kinase_domain_alignment", pa.string()),
+    ("flanking_starts", pa.list_(pa.int32())),
+    ("flanking_ends", pa.list_(pa.int32())),
+    ("substitution_count", pa.int32()),
+])
+
+def substitutions_table(proteins: Iterable[Dict]) -> pa.Table:
+    """Flatten the substitutions of every protein into one columnar table, with one row per source."""
+    columns = {name: [] for name in substitutions_schema.names}
+    for protein in proteins:
+        uniprot_id = protein["uniprot_id"]
+        for sub in protein["substitutions"]:
+            alignment_pos = sub["alignment_pos"]
+            for source in substitution_sources(sub):
+                columns["uniprot_id"].append(uniprot_id)
+                columns["full_sequence_pos"].append(sub["full_sequence_pos"])
+                columns["alignment_pos"].append(alignment_pos if isinstance(alignment_pos, int) else None)
+                columns["from"].append(sub["from"])
+                columns["to"].append(sub["to"])
+                columns["location"].append(sub["location"])
+                columns["database"].append(source["database"])
+                columns["count"].append(source["count"])
+    return pa.table(columns, schema=substitutions_schema)
+
+def proteins_table(proteins: Iterable[Dict]) -> pa.Table:
+    """Build one row per protein with its sequence, domain bounds and flanking ranges."""
+    columns = {name: [] for name in proteins_schema.names}
+    for protein in proteins:
+        columns["uniprot_id"].append(protein["uniprot_id"])
+        columns["sequence"].append(protein["sequence"])
+        columns["kinase_domain_sequence"].append(protein["kinase_domain"]["sequence"])
+        columns["kinase_domain_start"].append(protein["kinase_domain"]["start"])
+        columns["kinase_domain_end"].append(protein["kinase_domain"]["end"])
+        columns["kinase_domain_alignment"].append(protein["kinase_domain_alignment"]["sequence"])
+        columns["flanking_starts"].append([region["start"] for region in protein["flanking_positions"]])
+        columns["flanking_ends"].append([region["end"] for region in protein["flanking_positions"]])
+        columns["substitution_count"].append(len(protein["substitutions"]))
+    return pa.table(columns, schema=proteins_schema)
+
+def write_columnar(proteins: List[Dict], output_dir: str) -> None:
+    """Write substitutions.parquet and proteins.parquet into output_dir."""
+    os.makedirs(output_dir, exist_ok=True)
+    substitutions_path = os.path.join(output_dir, 'substitutions.parquet')
+    proteins_path = os.path.join(output_dir, 'proteins.parquet')
+
+    # Sorted by protein and position so row-group statistics make kinase/position filters cheap
+    substitutions = substitutions_table(proteins).sort_by([("uniprot_id", "ascending"), ("full_sequence_pos", "ascending")])
+    pq.write_table(substitutions, substitutions_path, compression='zstd')
+    pq.write_table(proteins_table(proteins), proteins_path, compression='zstd')
+    print(f"Saved {substitutions.num_rows} substitution rows to {substitutions_path}")
+    print(f"Saved {len(proteins)} proteins to {proteins_path}")
+
+def read_substitutions(output_dir: str, columns: Optional[List[str]] = None,
+                       uniprot_ids: Optional[List[str]] = None,
+                       min_pos: Optional[int] = None, max_pos: Optional[int] = None) -> pa.Table:
+    """Read selected substitution columns, filtered by protein and full-sequence position."""
+    filters = []
+    if uniprot_ids:
+        filters.append(("uniprot_id", "in", list(uniprot_ids)))
+    if min_pos is not None:
+        filters.append(("full_sequence_pos", ">=", min_pos))
+    if max_pos is not None:
+        filters.append(("full_sequence_pos", "<=", max_pos))
+    return pq.read_table(os.path.join(output_dir, 'substitutions.parquet'),
+                         columns=columns, filters=filters or None)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a kinsnps_allinfo JSON file to Parquet tables")
+    parser.add_argument('--input', '-i', type=str, default='./data/kinsnps_allinfo_twodbs.json',
+                      help='Path to input JSON file')
+    parser.add_argument('--output', '-o', type=str, default='./data/kinsnps_allinfo_parquet',
+                      help='Directory for substitutions.parquet and proteins.parquet')
+    args = parser.parse_args()
+
+    with open(args.input, 'r') as file:
+        data = json.load(file)
+    write_columnar(data, args.output)
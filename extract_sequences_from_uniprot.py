@@ -1,17 +1,23 @@
 import requests
+from http_cache import cached_get, default_cache
+import argparse
 import csv
 import time
 import os
-from typing import Dict
+from typing import Dict, Iterable, Iterator, List, Set
+
+proteins_api_url = "https://www.ebi.ac.uk/proteins/api/proteins"
+bulk_batch_size = 100  # Accessions per bulk request, the Proteins API maximum page size
 
 def get_protein_data(uniprot_id):
-    time.sleep(0.1)
     url = f"https://www.ebi.ac.uk/proteins/api/proteins/{uniprot_id}"
     headers = {
         'Accept': 'application/json'
     }
     
-    response = requests.get(url, headers=headers)
+    response = cached_get(url, headers=headers)
+    if not response.from_cache:
+        time.sleep(0.1)
     
     if response.status_code == 200:
         return response.json()
@@ -23,13 +29,14 @@ def get_protein_data(uniprot_id):
         return None
 
 def get_isoform_sequences(uniprot_id):
-    time.sleep(0.1)
     url = f"https://www.ebi.ac.uk/proteins/api/proteins/{uniprot_id}/isoforms"
     headers = {
         'Accept': 'application/json'
     }
     
-    response = requests.get(url, headers=headers)
+    response = cached_get(url, headers=headers)
+    if not response.from_cache:
+        time.sleep(0.1)
     
     if response.status_code == 200:
         data = response.json()
@@ -41,6 +48,81 @@ def get_isoform_sequences(uniprot_id):
     else:
         return None
 
+def get_proteins_batch(uniprot_ids: List[str], session=None) -> List[Dict]:
+    """Fetch several entries with one comma-separated accession query."""
+    params = {'offset': 0, 'size': len(uniprot_ids), 'accession': ','.join(uniprot_ids)}
+    response = cached_get(proteins_api_url, params=params, headers={'Accept': 'application/json'}, session=session)
+    if not response.from_cache:
+        time.sleep(0.1)
+
+    if response.status_code == 200:
+        return response.json()
+    print(f"Error {response.status_code} for batch starting with UniProt ID {uniprot_ids[0]}.")
+    return []
+
+def iter_protein_batches(uniprot_ids: List[str], batch_size: int = bulk_batch_size, session=None) -> Iterator[List[Dict]]:
+    """Yield the entries of each batch in request order, reporting accessions the API did not return."""
+    for i in range(0, len(uniprot_ids), batch_size):
+        batch = uniprot_ids[i:i + batch_size]
+        entries = {entry['accession']: entry for entry in get_proteins_batch(batch, session)}
+        found = []
+        for uniprot_id in batch:
+            if uniprot_id in entries:
+                found.append(entries.pop(uniprot_id))
+            else:
+                print(f"UniProt ID {uniprot_id} not found.")
+        # Entries returned under another primary accession (secondary IDs in the mapping)
+        found.extend(entries.values())
+        yield found
+
+def fasta_record(protein_data: Dict) -> str:
+    """Format a Proteins API entry as a FASTA record followed by a blank line."""
+    sequence = protein_data.get('sequence', {}).get('sequence', '')
+    fasta_header = (
+        f">{protein_data['accession']}|{protein_data['id']}|{protein_data['protein']['recommendedName']['fullName']['value']}|"
+        f"GN={protein_data['gene'][0]['name']['value']}|OS={next((n['value'] for n in protein_data['organism']['names'] if n['type'] == 'scientific'), 'N/A')}|OX={protein_data['organism']['taxonomy']}"
+    )
+    return f"{fasta_header}\n{sequence}\n\n"
+
+def truncate_torn_record(fasta_path: str) -> None:
+    """Drop a partially written last record so appends start after a complete one."""
+    if not os.path.exists(fasta_path):
+        return
+    with open(fasta_path, 'rb+') as f:
+        data = f.read()
+        if data and not data.endswith(b'\n\n'):
+            end = data.rfind(b'\n\n')
+            f.truncate(end + 2 if end >= 0 else 0)
+
+def get_fasta_accessions(fasta_path: str) -> Set[str]:
+    """Return the accessions of the records already in a FASTA file."""
+    accessions = set()
+    if os.path.exists(fasta_path):
+        with open(fasta_path, 'r') as f:
+            for line in f:
+                if line.startswith('>'):
+                    accessions.add(line.split('|')[0][1:])
+    return accessions
+
+def generate_fasta_bulk(uniprot_ids: Iterable[str], output_fasta: str, batch_size: int = bulk_batch_size) -> int:
+    """Append every UniProt ID not yet in output_fasta, fetched in batches; returns the number of records written."""
+    truncate_torn_record(output_fasta)
+    existing = get_fasta_accessions(output_fasta)
+    pending = [uniprot_id for uniprot_id in dict.fromkeys(uniprot_ids) if uniprot_id not in existing]
+    print(f"Skipping {len(existing)} sequences already in {output_fasta}, fetching {len(pending)}")
+
+    written = 0
+    with requests.Session() as session, open(output_fasta, 'a') as fasta_file:
+        for entries in iter_protein_batches(pending, batch_size, session):
+            for protein_data in entries:
+                if protein_data['accession'] in existing:
+                    continue
+                fasta_file.write(fasta_record(protein_data))
+                existing.add(protein_data['accession'])
+                written += 1
+            fasta_file.flush()  # A complete batch survives an interrupted run
+    return written
+
 # def sequence_matches_position(sequence, position, wt_amino_acid):
 #     try:
 #         return sequence[int(position) - 1] == wt_amino_acid
@@ -59,9 +141,9 @@ def create_omim_uniprot_mapping() -> Dict[str, str]:
     
     return mapping
 
-def generate_fasta(input_tsv, output_fasta, mode):
-    processed_uniprot_ids = set()  # To track processed UniProt IDs
-        
+def generate_fasta(uniprot_data, output_fasta, mode):
+    processed_uniprot_ids = get_fasta_accessions(output_fasta) if mode == 'a' else set()  # To track processed UniProt IDs
+
     with open(output_fasta, mode) as fasta_file:
         for mim_number, uniprot_id in uniprot_data.items():
             if uniprot_id in processed_uniprot_ids:
@@ -72,15 +154,10 @@ def generate_fasta(input_tsv, output_fasta, mode):
             
             if protein_data:
                 # Check the main protein sequence first
-                sequence = protein_data.get('sequence', {}).get('sequence', '')
                 # for pos in positions:
                 #     if sequence_matches_position(sequence, pos['Position'], pos['WT Amino Acid']):
                         # Write the main protein sequence to the FASTA file
-                fasta_header = (
-                    f">{protein_data['accession']}|{protein_data['id']}|{protein_data['protein']['recommendedName']['fullName']['value']}|"
-                    f"GN={protein_data['gene'][0]['name']['value']}|OS={next((n['value'] for n in protein_data['organism']['names'] if n['type'] == 'scientific'), 'N/A')}|OX={protein_data['organism']['taxonomy']}"
-                )
-                fasta_file.write(f"{fasta_header}\n{sequence}\n\n")
+                fasta_file.write(fasta_record(protein_data))
                 processed_uniprot_ids.add(uniprot_id)
                 # break  # Skip isoform checking if main sequence matches any position
 
@@ -133,21 +210,29 @@ def report_missings(tsv_file, fasta_file):
         print("All UniProt IDs in the TSV file are present in the FASTA file.")
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fetch kinase sequences from the EBI Proteins API into a FASTA file")
+    parser.add_argument('--output', '-o', type=str, default='./data/human_kinases.fasta',
+                      help='FASTA file to resume or create (default: ./data/human_kinases.fasta)')
+    parser.add_argument('--overwrite', action='store_true',
+                      help='Re-create the FASTA file instead of appending the missing sequences')
+    parser.add_argument('--batch-size', type=int, default=bulk_batch_size,
+                      help=f'Accessions per bulk request (default: {bulk_batch_size})')
+    parser.add_argument('--per-id', action='store_true',
+                      help='Use the old one-request-per-accession downloader')
+    args = parser.parse_args()
+
     # input_tsv = './kinsnps/subkinsnps_uid_subs_split.txt'
     uniprot_data = create_omim_uniprot_mapping()
-    output_fasta = './data/human_kinases.fasta'
-
-    if os.path.exists(output_fasta):
-        user_input = input(f"File {output_fasta} exists. Do you want to re-create it or append to it? (r/a): ").strip().lower()
-        if user_input == 'r':
-            mode = 'w'
-        elif user_input == 'a':
-            mode = 'a'
-        else:
-            print("Invalid option. Exiting.")
-            exit()
-    else:
-        mode = 'w'
+    output_fasta = args.output
 
-    generate_fasta(uniprot_data, output_fasta, mode)
+    if args.overwrite and os.path.exists(output_fasta):
+        os.remove(output_fasta)
+
+    start_time = time.perf_counter()
+    if args.per_id:
+        generate_fasta(uniprot_data, output_fasta, 'a')
+    else:
+        written = generate_fasta_bulk(uniprot_data.values(), output_fasta, args.batch_size)
+        print(f"Wrote {written} sequences in {time.perf_counter() - start_time:.1f}s")
+    print(default_cache.report())
     # report_missings(uniprot_data, output_fasta)
\ No newline at end of file
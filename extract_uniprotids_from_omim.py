@@ -1,8 +1,8 @@
 from typing import Dict
+import argparse
 import csv
-import requests
-from bs4 import BeautifulSoup
-from time import sleep
+from http_cache import default_cache
+from omim_scraper import scrape_uniprot_ids
 import random
 import os
 from collections import OrderedDict
@@ -79,6 +79,13 @@ def get_notmapped_omim_ids() -> set:
     return all_omim_ids - mapped_ids
     
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Map OMIM IDs to UniProt IDs by scraping OMIM entry pages")
+    parser.add_argument('--workers', '-w', type=int, default=4,
+                      help='Number of pages fetched concurrently (default: 4)')
+    parser.add_argument('--delay', type=float, default=0.5,
+                      help='Minimum seconds between requests to omim.org, plus up to 2 s of jitter (default: 0.5)')
+    args = parser.parse_args()
+
     # Check for unmapped OMIM IDs first
     unmapped_ids = get_notmapped_omim_ids()
     print(f"Found {len(unmapped_ids)} unmapped OMIM IDs:")
@@ -115,35 +122,33 @@ if __name__ == '__main__':
         
         # Write header row only if we're creating a new file
         if file_mode == 'w':
-            csv_writer.writerow(['OMIM_ID', 'UniProt_ID'])
+            csv_writer.writerow(['omim_id', 'uniprot_id'])  # Read by omim_mutations.py and extract_sequences_from_uniprot.py
         
-        for omim_id in list(omim_ids):
+        pending = []
+        for omim_id in sorted(omim_ids):
             # Skip if we already have this mapping
             if omim_id in existing_mappings:
                 print(f"Skipping OMIM ID: {omim_id}, already mapped to UniProt ID: {existing_mappings[omim_id]}")
                 continue
-                
-            url = f'https://omim.org/entry/{omim_id}'
-            headers = get_headers()
-            try:
-                response = requests.get(url, headers=headers)
-                sleep(random.uniform(0.5, 2.5))
-                response.raise_for_status()
-                html_content = response.text
-                soup = BeautifulSoup(html_content, 'html.parser')
-                uniprot_link = soup.find('a', href=lambda href: href and 'uniprot.org/uniprotkb/' in href)
-                uniprot_id = uniprot_link['href'].split('/')[-1]
-                omim_uniprot_mapping[omim_id] = uniprot_id
-                print(f"OMIM ID: {omim_id}, UniProt ID: {uniprot_id}")
-                
-                # Write to CSV
-                csv_writer.writerow([omim_id, uniprot_id])
-                
-            except requests.RequestException as e:
-                print(f"Failed to fetch data for omim id {omim_id}: {e}")
-                uniprot_id = None
-                
+            pending.append(omim_id)
+
+        # Pages are fetched concurrently, rows are written here as they complete
+        for omim_id, uniprot_id, error in scrape_uniprot_ids(pending, get_headers, args.workers, args.delay, 2.0):
+            if error is not None:
+                print(f"Failed to fetch data for omim id {omim_id}: {error}")
+                continue
+            if uniprot_id is None:
+                print(f"No UniProt link found for omim id {omim_id}")
+                continue
+            omim_uniprot_mapping[omim_id] = uniprot_id
+            print(f"OMIM ID: {omim_id}, UniProt ID: {uniprot_id}")
+
+            # Write to CSV
+            csv_writer.writerow([omim_id, uniprot_id])
+            csvfile.flush()
+
     print("Done!")
+    print(default_cache.report())
 
 
     # check fasta file
@@ -2,16 +2,23 @@ import os
 import csv
 import time
 import glob
+import queue
+import argparse
+import threading
+import statistics
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.firefox.options import Options as FirefoxOptions
 
-def setup_driver():
+clinvar_dir = "./data/clinvar"
+downloads_dir = "./data/clinvar/.downloads"  # One subdirectory per browser
+
+def setup_driver(download_dir=clinvar_dir):
     options = FirefoxOptions()
     options.add_argument("--headless")  # Run in background
-    download_dir = os.path.abspath("./data/clinvar")
+    download_dir = os.path.abspath(download_dir)
     
     # Ensure download directory exists
     os.makedirs(download_dir, exist_ok=True)
@@ -23,9 +30,26 @@ def setup_driver():
     
     return webdriver.Firefox(options=options)
 
-def get_clinvar_data(mim_number, driver):
-    download_dir = os.path.abspath("./data/clinvar")
-    target_file = os.path.join(download_dir, f"{mim_number}.txt")
+def wait_for_download(download_dir, max_wait=80, stable_for=2.0, poll=0.5):
+    """Return the finished clinvar_result file once no .part file remains and its size stopped changing."""
+    start_time = time.time()
+    last_size, stable_since = None, None
+    while time.time() - start_time < max_wait:
+        names = os.listdir(download_dir)
+        results = [n for n in names if n.startswith("clinvar_result") and n.endswith(".txt")]
+        if results and not any(n.endswith(".part") for n in names):
+            path = os.path.join(download_dir, max(results, key=lambda n: os.path.getmtime(os.path.join(download_dir, n))))
+            size = os.path.getsize(path)
+            if size != last_size:
+                last_size, stable_since = size, time.time()
+            elif size > 0 and time.time() - stable_since >= stable_for:
+                return path
+        time.sleep(poll)
+    return None
+
+def get_clinvar_data(mim_number, driver, download_dir=clinvar_dir, output_dir=clinvar_dir):
+    download_dir = os.path.abspath(download_dir)
+    target_file = os.path.join(os.path.abspath(output_dir), f"{mim_number}.txt")
     
     # Delete existing clinvar_result files to prevent numbering
     for f in glob.glob(os.path.join(download_dir, "clinvar_result*")):
@@ -45,58 +69,93 @@ def get_clinvar_data(mim_number, driver):
         WebDriverWait(driver, 20).until(
             EC.element_to_be_clickable((By.XPATH, "//button[text()='Create File']"))
         ).click()
-        time.sleep(20)
-        # Wait for download to complete (check for 60 seconds)
-        start_time = time.time()
-        max_wait = 60
-        downloaded = False
-        
-        while time.time() - start_time < max_wait:
-            # Check for new clinvar_result.txt (ignore .part files)
-            clinvar_files = glob.glob(os.path.join(download_dir, "clinvar_result*.txt"))
-            clinvar_files = [f for f in clinvar_files if not f.endswith('.part')]
-            
-            if clinvar_files:
-                newest_file = max(clinvar_files, key=os.path.getctime)
-                try:
-                    os.rename(newest_file, target_file)
-                    print(f"Renamed: {os.path.basename(newest_file)} → {mim_number}.txt")
-                    downloaded = True
-                    break
-                except Exception as e:
-                    print(f"Retrying rename due to: {e}")
-                    time.sleep(2)
-            time.sleep(1)
-        
-        if not downloaded:
+
+        # Wait until the download has finished writing instead of a fixed sleep
+        downloaded_file = wait_for_download(download_dir)
+        if downloaded_file is None:
             print(f"Timeout for {mim_number}.txt")
             return False
+        os.replace(downloaded_file, target_file)
+        print(f"Renamed: {os.path.basename(downloaded_file)} → {mim_number}.txt")
         return True
 
     except Exception as e:
         print(f"Error for {mim_number}: {e}")
         return False
 
+def browser_worker(worker_id, mim_queue, timings, lock, delay):
+    """Take MIM numbers from the queue with a private browser and download directory until the queue is empty."""
+    download_dir = os.path.join(downloads_dir, f"worker{worker_id}")
+    driver = setup_driver(download_dir)
+    try:
+        while True:
+            try:
+                mim = mim_queue.get_nowait()
+            except queue.Empty:
+                return
+            print(f"[browser {worker_id}] Downloading: {mim}")
+            start_time = time.perf_counter()
+            success = get_clinvar_data(mim, driver, download_dir)
+            with lock:
+                timings[mim] = (success, time.perf_counter() - start_time)
+            print(f"[browser {worker_id}] Status for {mim}: {'Success' if success else 'Failed'}")
+            time.sleep(delay)  # Avoid server overload
+    finally:
+        driver.quit()
+
+def timing_report(timings):
+    """Summarize per-MIM download times."""
+    succeeded = sorted(seconds for success, seconds in timings.values() if success)
+    failed = sorted(mim for mim, (success, _) in timings.items() if not success)
+    lines = [f"Downloaded {len(succeeded)} files, {len(failed)} failed"]
+    if succeeded:
+        lines.append(f"Per MIM: mean {sum(succeeded) / len(succeeded):.1f}s, "
+                     f"median {statistics.median(succeeded):.1f}s, max {succeeded[-1]:.1f}s")
+        slowest = sorted(timings.items(), key=lambda item: item[1][1], reverse=True)[:5]
+        lines.append("Slowest: " + ", ".join(f"{mim} ({seconds:.1f}s)" for mim, (_, seconds) in slowest))
+    if failed:
+        lines.append("Failed: " + ", ".join(failed))
+    return "\n".join(lines)
+
 def main():
+    parser = argparse.ArgumentParser(description="Download ClinVar exports per OMIM ID with headless Firefox")
+    parser.add_argument('--browsers', '-b', type=int, default=1,
+                      help='Number of Firefox instances downloading in parallel (default: 1)')
+    parser.add_argument('--delay', type=float, default=5.0,
+                      help='Seconds each browser waits between downloads (default: 5)')
+    parser.add_argument('--timings', type=str, default=None,
+                      help='Optional CSV file for the per-MIM status and seconds')
+    args = parser.parse_args()
+
     with open('./data/omim_ids.csv', 'r') as f:
         omim_ids = [row["mimNumber"] for row in csv.DictReader(f) if row["mimNumber"] != "Not Found"]
     
-    driver = setup_driver()
-    
-    try:
-        for mim in omim_ids:
-            output_path = os.path.join("./data/clinvar", f"{mim}.txt")
-            if os.path.exists(output_path):
-                print(f"Skipping existing: {mim}")
-                continue
-            
-            print(f"Downloading: {mim}")
-            success = get_clinvar_data(mim, driver)
-            print(f"Status: {'Success' if success else 'Failed'}")
-            time.sleep(5)  # Avoid server overload
-    
-    finally:
-        driver.quit()
+    mim_queue = queue.Queue()
+    for mim in omim_ids:
+        output_path = os.path.join(clinvar_dir, f"{mim}.txt")
+        if os.path.exists(output_path):
+            print(f"Skipping existing: {mim}")
+            continue
+        mim_queue.put(mim)
+
+    timings = {}
+    lock = threading.Lock()
+    start_time = time.perf_counter()
+    workers = [threading.Thread(target=browser_worker, args=(i, mim_queue, timings, lock, args.delay))
+               for i in range(min(args.browsers, mim_queue.qsize()))]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    print(timing_report(timings))
+    print(f"Total time: {time.perf_counter() - start_time:.1f}s")
+    if args.timings:
+        with open(args.timings, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['mim_number', 'success', 'seconds'])
+            for mim, (success, seconds) in timings.items():
+                writer.writerow([mim, success, f"{seconds:.2f}"])
     print("Finished")
 if __name__ == "__main__":
     main()
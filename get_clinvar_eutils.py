@@ -0,0 +1,198 @@
+import os
+import csv
+import time
+import random
+import argparse
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+import requests
+from dotenv import load_dotenv
+from http_cache import default_cache
+from omim_scraper import HostThrottle
+
+load_dotenv()
+ncbi_api_key = os.getenv('NCBI_API_KEY')
+
+eutils_base_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils"
+clinvar_dir = './data/clinvar'
+search_page_size = 5000  # Variation IDs per esearch page
+summary_batch_size = 200  # Variation IDs per esummary request
+
+# Column layout of the ClinVar web "Create File" tabular export, read by kinsnps_allinfo.parse_clinvar_file
+export_columns = [
+    'Name', 'Gene(s)', 'Protein change', 'Condition(s)', 'Accession',
+    'GRCh37Chromosome', 'GRCh37Location', 'GRCh38Chromosome', 'GRCh38Location',
+    'VariationID', 'AlleleID(s)', 'dbSNP ID', 'Canonical SPDI', 'Variant type', 'Molecular consequence',
+    'Germline classification', 'Germline date last evaluated', 'Germline review status',
+    'Somatic clinical impact', 'Somatic clinical impact date last evaluated', 'Somatic clinical impact review status',
+    'Oncogenicity classification', 'Oncogenicity date last evaluated', 'Oncogenicity review status'
+]
+
+def eutils_get(endpoint: str, params: Dict, session, throttle: HostThrottle, base_url: str = eutils_base_url,
+               max_retries: int = 4, backoff: float = 1.0) -> Dict:
+    """GET an E-utilities endpoint as JSON, retrying 429 and 5xx responses with backoff."""
+    url = f"{base_url}/{endpoint}"
+    params = dict(params, retmode='json')
+    if ncbi_api_key:
+        params['api_key'] = ncbi_api_key
+    cached = default_cache.lookup(url, params)
+    if cached is not None:
+        return cached.json()  # Cache hits do not count against the NCBI rate limit
+
+    for attempt in range(max_retries + 1):
+        throttle.wait(url)
+        response = session.get(url, params=params)
+        if response.status_code == 200:
+            default_cache.store(url, params, response.status_code, response.headers, response.content,
+                                response.encoding or response.apparent_encoding)
+            return response.json()
+        if response.status_code != 429 and response.status_code < 500:
+            response.raise_for_status()
+        if attempt < max_retries:
+            time.sleep(backoff * 2 ** attempt + random.uniform(0, backoff))
+    response.raise_for_status()
+
+def search_variation_ids(mim_number: str, session, throttle: HostThrottle, base_url: str = eutils_base_url) -> List[str]:
+    """Return the ClinVar variation IDs matching {mim_number}[MIM], the same term the web search uses."""
+    ids = []
+    while True:
+        params = {'db': 'clinvar', 'term': f'{mim_number}[MIM]', 'retstart': len(ids), 'retmax': search_page_size}
+        result = eutils_get('esearch.fcgi', params, session, throttle, base_url)['esearchresult']
+        ids.extend(result['idlist'])
+        if not result['idlist'] or len(ids) >= int(result['count']):
+            return ids
+
+def format_date(value: Optional[str]) -> str:
+    """Convert an esummary date ("2009/07/30 00:00") to the export format ("Jul 30, 2009")."""
+    try:
+        date = datetime.strptime((value or '').split(' ')[0], '%Y/%m/%d')
+    except ValueError:
+        return ''
+    if date.year <= 1:  # NCBI's placeholder for "not evaluated"
+        return ''
+    return f"{date:%b} {date.day}, {date.year}"
+
+def format_location(location: Dict) -> str:
+    start, stop = location.get('start', ''), location.get('stop', '')
+    return start if start == stop else f"{start} - {stop}"
+
+def classification_fields(classification: Optional[Dict]) -> List[str]:
+    classification = classification or {}
+    return [classification.get('description', ''), format_date(classification.get('last_evaluated')),
+            classification.get('review_status', '')]
+
+def summary_to_row(summary: Dict) -> List[str]:
+    """Map one esummary document to the export columns."""
+    variations = summary.get('variation_set', [])
+    assemblies = {'GRCh37': ([], []), 'GRCh38': ([], [])}
+    for variation in variations:
+        for location in variation.get('variation_loc', []):
+            if location.get('status') == 'current' and location.get('assembly_name') in assemblies:
+                chromosomes, locations = assemblies[location['assembly_name']]
+                chromosomes.append(location.get('chr', ''))
+                locations.append(format_location(location))
+
+    germline = summary.get('germline_classification') or {}
+    traits = germline.get('trait_set') or summary.get('trait_set', [])
+    return [
+        summary.get('title', ''),
+        '|'.join(gene['symbol'] for gene in summary.get('genes', [])),
+        summary.get('protein_change', ''),
+        '|'.join(trait['trait_name'] for trait in traits),
+        summary.get('accession', ''),
+        '|'.join(assemblies['GRCh37'][0]), '|'.join(assemblies['GRCh37'][1]),
+        '|'.join(assemblies['GRCh38'][0]), '|'.join(assemblies['GRCh38'][1]),
+        summary.get('uid', ''),
+        '|'.join(str(variation.get('measure_id', '')) for variation in variations),
+        '|'.join(f"rs{xref['db_id']}" for variation in variations
+                 for xref in variation.get('variation_xrefs', []) if xref.get('db_source') == 'dbSNP'),
+        '|'.join(variation['canonical_spdi'] for variation in variations if variation.get('canonical_spdi')),
+        '|'.join(variation['variant_type'] for variation in variations if variation.get('variant_type')),
+        '|'.join(summary.get('molecular_consequence_list', [])),
+        *classification_fields(germline),
+        *classification_fields(summary.get('clinical_impact_classification')),
+        *classification_fields(summary.get('oncogenicity_classification')),
+    ]
+
+def write_export(rows: List[List[str]], target_file: str) -> None:
+    """Write rows in the web export layout (every line ends with a tab), replacing target_file atomically."""
+    tmp_file = f"{target_file}.part"
+    with open(tmp_file, 'w', newline='') as f:
+        for row in [export_columns] + rows:
+            f.write('\t'.join(field.replace('\t', ' ').replace('\n', ' ') for field in row) + '\t\n')
+    os.replace(tmp_file, target_file)
+
+def is_valid_export(filename: str) -> bool:
+    """Check that a previously fetched file starts with the export header."""
+    try:
+        with open(filename, 'r') as f:
+            return f.readline().startswith('Name\tGene(s)\tProtein change')
+    except (FileNotFoundError, UnicodeDecodeError):
+        return False
+
+def fetch_clinvar_export(mim_number: str, session, throttle: HostThrottle, directory: str = clinvar_dir,
+                         base_url: str = eutils_base_url) -> int:
+    """Fetch every ClinVar record for a MIM number into {directory}/{mim_number}.txt; returns the row count."""
+    ids = search_variation_ids(mim_number, session, throttle, base_url)
+    rows = []
+    for i in range(0, len(ids), summary_batch_size):
+        batch = ids[i:i + summary_batch_size]
+        result = eutils_get('esummary.fcgi', {'db': 'clinvar', 'id': ','.join(batch)}, session, throttle, base_url)['result']
+        rows.extend(summary_to_row(result[uid]) for uid in batch if uid in result)
+    write_export(rows, os.path.join(directory, f"{mim_number}.txt"))
+    return len(rows)
+
+def download_clinvar_exports(mim_numbers: List[str], workers: int = 3, rate: float = 3.0,
+                             directory: str = clinvar_dir, base_url: str = eutils_base_url) -> Dict[str, float]:
+    """Fetch missing or invalid exports in a bounded thread pool; returns seconds spent per fetched MIM number."""
+    os.makedirs(directory, exist_ok=True)
+    pending = [mim for mim in mim_numbers if not is_valid_export(os.path.join(directory, f"{mim}.txt"))]
+    print(f"Skipping {len(mim_numbers) - len(pending)} existing files, downloading {len(pending)}")
+
+    throttle = HostThrottle(1.0 / rate, 0)
+    local = threading.local()
+
+    def work(mim_number):
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        start_time = time.perf_counter()
+        count = fetch_clinvar_export(mim_number, local.session, throttle, directory, base_url)
+        return count, time.perf_counter() - start_time
+
+    timings = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(work, mim): mim for mim in pending}
+        for future in as_completed(futures):
+            mim_number = futures[future]
+            try:
+                count, seconds = future.result()
+            except (requests.RequestException, ValueError, KeyError) as e:
+                print(f"Error for {mim_number}: {e}")
+                continue
+            timings[mim_number] = seconds
+            print(f"Saved {mim_number}.txt: {count} records in {seconds:.1f}s")
+    return timings
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download ClinVar tabular exports per OMIM ID through E-utilities")
+    parser.add_argument('--workers', '-w', type=int, default=3,
+                      help='Number of MIM numbers fetched concurrently (default: 3)')
+    parser.add_argument('--rate', '-r', type=float, default=None,
+                      help='Maximum requests per second sent to NCBI (default: 3, or 10 with NCBI_API_KEY)')
+    parser.add_argument('--output-dir', '-o', type=str, default=clinvar_dir,
+                      help=f'Directory for the {{mim}}.txt exports (default: {clinvar_dir})')
+    parser.add_argument('--base-url', type=str, default=eutils_base_url,
+                      help='E-utilities base URL, e.g. a local stub server for testing')
+    args = parser.parse_args()
+
+    with open('./data/omim_ids.csv', 'r') as f:
+        omim_ids = [row["mimNumber"] for row in csv.DictReader(f) if row["mimNumber"] != "Not Found"]
+
+    rate = args.rate or (10.0 if ncbi_api_key else 3.0)
+    start_time = time.perf_counter()
+    timings = download_clinvar_exports(omim_ids, args.workers, rate, args.output_dir, args.base_url)
+    print(f"Fetched {len(timings)} files in {time.perf_counter() - start_time:.1f}s")
+    print(default_cache.report())
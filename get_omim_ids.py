@@ -1,40 +1,183 @@
 import os
+import json
+import argparse
 import requests
 import csv
 from dotenv import load_dotenv
+from http_cache import cached_get, default_cache
 
 load_dotenv()
 api_key = os.getenv('OMIM_API_KEY')
 
+omim_api_url = "https://api.omim.org/api"
+kinase_list_file = './data/kinase_list.csv'
+output_file = './data/omim_ids.csv'
+cache_file = './data/omim_ids_cache.json'  # Gene -> {"mimNumber", "preferredTitle"}, null when the search found nothing
+batch_size = 10  # Genes per multi-term search, and MIM numbers per entry lookup
+
 # Function to get OMIM ID and preferred title from the API
-def get_omim_id_and_title(gene):
-    url = f"https://api.omim.org/api/entry/search?search={gene}&exclude=all&format=json&start=0&limit=10&apiKey={api_key}"
-    response = requests.get(url)
-    if response.status_code == 200:
-        data = response.json()
-        if data['omim']['searchResponse']['entryList']:
-            entry = data['omim']['searchResponse']['entryList'][0]['entry']
-            return entry['mimNumber'], entry['titles']['preferredTitle']
+def get_omim_id_and_title(gene, session=requests):
+    """Return (mimNumber, preferredTitle), or (None, None) if the search found nothing; failed requests raise."""
+    url = f"{omim_api_url}/entry/search?search={gene}&exclude=all&format=json&start=0&limit=10&apiKey={api_key}"
+    response = cached_get(url, session=session)
+    response.raise_for_status()
+    data = response.json()
+    if data['omim']['searchResponse']['entryList']:
+        entry = data['omim']['searchResponse']['entryList'][0]['entry']
+        return entry['mimNumber'], entry['titles']['preferredTitle']
     return None, None
 
-# Read the kinase list
-kinase_list_file = './data/kinase_list.csv'
-with open(kinase_list_file, 'r') as csvfile:
-    reader = csv.DictReader(csvfile)
-    kinases = [row['gene'] for row in reader]
+def entry_gene_symbols(entry, field='approvedGeneSymbols'):
+    """Return the gene symbols listed in one field of an OMIM entry's gene map."""
+    symbols = entry.get('geneMap', {}).get(field, '')
+    return {symbol.strip().upper() for symbol in symbols.split(',') if symbol.strip()}
 
-# Write the OMIM IDs and titles to omim_ids.csv
-output_file = './data/omim_ids.csv'
-with open(output_file, 'w', newline='') as csvfile:
-    fieldnames = ['gene', 'mimNumber', 'preferredTitle']
-    writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-    
-    writer.writeheader()
-    for gene in kinases:
-        mimNumber, preferredTitle = get_omim_id_and_title(gene)
-        if mimNumber and preferredTitle:
-            writer.writerow({'gene': gene, 'mimNumber': mimNumber, 'preferredTitle': preferredTitle})
-        else:
-            writer.writerow({'gene': gene, 'mimNumber': 'Not Found', 'preferredTitle': 'Not Found'})
-
-print(f"OMIM IDs and titles have been written to {output_file}")
\ No newline at end of file
+def search_genes_batch(genes, session):
+    """Resolve several genes with one approved-gene-symbol search; unresolved genes are left out.
+
+    A failed request resolves nothing, so the caller falls back to single searches for the batch.
+    """
+    query = ' OR '.join(f'approved_gene_symbol:{gene}' for gene in genes)
+    params = {'search': query, 'include': 'geneMap', 'format': 'json', 'start': 0,
+              'limit': min(2 * len(genes), 20), 'apiKey': api_key}
+    try:
+        response = cached_get(f"{omim_api_url}/entry/search", params=params, session=session)
+    except requests.RequestException as e:
+        print(f"Batch search failed: {e}")
+        return {}
+    if response.status_code != 200:
+        print(f"Batch search failed with status code {response.status_code}")
+        return {}
+
+    resolved = {}
+    wanted = {gene.upper(): gene for gene in genes}
+    entries = [item['entry'] for item in response.json()['omim']['searchResponse']['entryList']]
+    # Approved symbols first; an alias only counts when no entry in the batch has the gene as its approved symbol
+    for field in ('approvedGeneSymbols', 'geneSymbols'):
+        for entry in entries:
+            for symbol in entry_gene_symbols(entry, field):
+                gene = wanted.get(symbol)
+                if gene and gene not in resolved:  # Keep the first (best ranked) hit, like the single search
+                    resolved[gene] = {'mimNumber': str(entry['mimNumber']), 'preferredTitle': entry['titles']['preferredTitle']}
+    return resolved
+
+def get_entries_batch(mim_numbers, session):
+    """Fetch current preferred titles for already known MIM numbers with one entry lookup."""
+    params = {'mimNumber': ','.join(str(mim) for mim in mim_numbers), 'format': 'json', 'apiKey': api_key}
+    # ttl=0 revalidates cached entries, so a refresh never returns titles older than the server's
+    try:
+        response = cached_get(f"{omim_api_url}/entry", params=params, session=session, ttl=0)
+    except requests.RequestException as e:
+        print(f"Entry lookup failed: {e}")
+        return {}
+    if response.status_code != 200:
+        print(f"Entry lookup failed with status code {response.status_code}")
+        return {}
+    return {str(item['entry']['mimNumber']): item['entry']['titles']['preferredTitle']
+            for item in response.json()['omim']['entryList']}
+
+def load_cache(path=cache_file):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_cache(cache, path=cache_file):
+    with open(path, 'w') as f:
+        json.dump(cache, f, indent=4, sort_keys=True)
+
+def load_existing_rows(path=output_file):
+    """Read the existing omim_ids.csv keyed by gene."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as csvfile:
+        return {row['gene']: row for row in csv.DictReader(csvfile)}
+
+def resolve_genes(genes, cache, session):
+    """Resolve genes that are not cached: batched searches first, single searches for the rest.
+
+    Genes whose request failed stay out of the cache, so the next run queries them again.
+    """
+    missing = [gene for gene in genes if gene not in cache]
+    requests_made = 0
+    failed = 0
+    for i in range(0, len(missing), batch_size):
+        batch = missing[i:i + batch_size]
+        resolved = search_genes_batch(batch, session)
+        requests_made += 1
+        cache.update(resolved)
+        for gene in batch:
+            if gene not in resolved:
+                requests_made += 1
+                try:
+                    mimNumber, preferredTitle = get_omim_id_and_title(gene, session)
+                except requests.RequestException as e:
+                    print(f"Search for {gene} failed: {e}")
+                    failed += 1
+                    continue
+                cache[gene] = {'mimNumber': str(mimNumber), 'preferredTitle': preferredTitle} if mimNumber and preferredTitle else None
+        save_cache(cache)  # Checkpoint after every batch
+    if failed:
+        print(f"{failed} genes could not be queried and will be retried on the next run")
+    return requests_made
+
+def refresh_titles(rows, session):
+    """Refresh preferred titles of rows with a known MIM number using batched entry lookups."""
+    known = [row for row in rows if row['mimNumber'] != 'Not Found']
+    for i in range(0, len(known), batch_size):
+        batch = known[i:i + batch_size]
+        titles = get_entries_batch([row['mimNumber'] for row in batch], session)
+        for row in batch:
+            row['preferredTitle'] = titles.get(row['mimNumber'], row['preferredTitle'])
+    return (len(known) + batch_size - 1) // batch_size
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resolve OMIM IDs for the kinase list")
+    parser.add_argument('--refresh-titles', action='store_true',
+                      help='Refresh titles of genes already in omim_ids.csv with batched entry lookups')
+    parser.add_argument('--retry-not-found', action='store_true',
+                      help='Query genes recorded as "Not Found" again')
+    args = parser.parse_args()
+
+    # Read the kinase list
+    with open(kinase_list_file, 'r') as csvfile:
+        reader = csv.DictReader(csvfile)
+        kinases = [row['gene'] for row in reader]
+
+    existing_rows = load_existing_rows()
+    cache = load_cache()
+    for gene, row in existing_rows.items():
+        # "Not Found" rows are also written for failed requests; only the cache records real empty results
+        if row['mimNumber'] != 'Not Found':
+            cache.setdefault(gene, {'mimNumber': row['mimNumber'], 'preferredTitle': row['preferredTitle']})
+    if args.retry_not_found:
+        cache = {gene: result for gene, result in cache.items() if result is not None}
+
+    with requests.Session() as session:
+        requests_made = resolve_genes(kinases, cache, session)
+
+        rows = []
+        for gene in kinases:
+            result = cache.get(gene)
+            if result:
+                rows.append({'gene': gene, 'mimNumber': result['mimNumber'], 'preferredTitle': result['preferredTitle']})
+            else:
+                rows.append({'gene': gene, 'mimNumber': 'Not Found', 'preferredTitle': 'Not Found'})
+        if args.refresh_titles:
+            requests_made += refresh_titles(rows, session)
+            for row in rows:
+                if row['mimNumber'] != 'Not Found':
+                    cache[row['gene']] = {'mimNumber': row['mimNumber'], 'preferredTitle': row['preferredTitle']}
+    save_cache(cache)
+
+    # Write the OMIM IDs and titles to omim_ids.csv
+    with open(output_file, 'w', newline='') as csvfile:
+        fieldnames = ['gene', 'mimNumber', 'preferredTitle']
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    print(f"Made {requests_made} OMIM API requests")
+    print(default_cache.report())
+    print(f"OMIM IDs and titles have been written to {output_file}")
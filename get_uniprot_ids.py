@@ -1,66 +1,97 @@
+import argparse
+import csv
+import os
 import pandas as pd
-import requests
-from bs4 import BeautifulSoup
-import time
-import random
+from http_cache import default_cache
+from omim_scraper import scrape_uniprot_ids
 
-# Load the CSV file
+# Input and output file paths
 input_file = './data/omim_ids_notfound.csv'
-df = pd.read_csv(input_file)
+output_file = './data/omim_ids_notfound_with_uniprot.csv'
 
-# Initialize the list to store UniProt IDs
-uniprot_ids = []
+# Append-only log of resolved MIM numbers, one "mimNumber,uniprot_id" line each
+checkpoint_file = './data/omim_ids_notfound_with_uniprot.checkpoint.csv'
+fsync_every = 20  # Checkpoint lines written between fsyncs
 
-# Output file path
-output_file = './data/omim_ids_notfound_with_uniprot.csv'
+headers = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1'
+}
+
+def load_checkpoint(path=checkpoint_file):
+    """Read resolved MIM numbers from the checkpoint log, ignoring a torn last line."""
+    resolved = {}
+    if not os.path.exists(path):
+        return resolved
+    with open(path, 'r', newline='') as f:
+        for line in f:
+            if not line.endswith('\n'):
+                break  # Interrupted write
+            row = next(csv.reader([line]))
+            if len(row) == 2:
+                resolved[row[0]] = row[1] or None
+    return resolved
+
+def truncate_torn_line(path=checkpoint_file):
+    """Drop a partially written last line so new appends start on a fresh line."""
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb+') as f:
+        data = f.read()
+        if data and not data.endswith(b'\n'):
+            f.truncate(data.rfind(b'\n') + 1)
+
+def resolve_mim_numbers(mim_numbers, resolved, path=checkpoint_file, workers=4, delay=1.0, jitter=3.0):
+    """Fetch every MIM number missing from `resolved` concurrently, appending each result to the checkpoint log."""
+    # "Not Found" rows have no OMIM entry to fetch
+    pending = [mim for mim in mim_numbers if mim.isdigit() and mim not in resolved]
+    print(f"Resuming with {len(resolved)} resolved MIM numbers, {len(pending)} to fetch")
+
+    truncate_torn_line(path)
+    with open(path, 'a', newline='') as f:
+        writer = csv.writer(f)
+        unsynced = 0
+        for mim_number, uniprot_id, error in scrape_uniprot_ids(pending, lambda: headers, workers, delay, jitter):
+            if error is not None:
+                # Not checkpointed, so the next run retries it
+                print(f"Failed to fetch data for MIM number {mim_number}: {error}")
+                continue
+
+            resolved[mim_number] = uniprot_id
+            writer.writerow([mim_number, uniprot_id or ''])
+            unsynced += 1
+            if unsynced >= fsync_every:
+                f.flush()
+                os.fsync(f.fileno())
+                unsynced = 0
+        f.flush()
+        os.fsync(f.fileno())
+    return resolved
+
+def compact(df, resolved, path=output_file):
+    """Write the input rows with their resolved UniProt IDs in input order."""
+    output_df = df.copy()
+    output_df['uniprot_id'] = [resolved.get(str(mim)) for mim in df['mimNumber']]
+    output_df.to_csv(path, index=False)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape UniProt IDs for OMIM entries without one")
+    parser.add_argument('--workers', '-w', type=int, default=4,
+                      help='Number of pages fetched concurrently (default: 4)')
+    parser.add_argument('--delay', type=float, default=1.0,
+                      help='Minimum seconds between requests to omim.org, plus up to 3 s of jitter (default: 1)')
+    args = parser.parse_args()
 
-# Create a copy of the dataframe to store the results
-output_df = pd.DataFrame(columns=df.columns.tolist() + ['uniprot_id'])
+    # Load the CSV file
+    df = pd.read_csv(input_file)
+    mim_numbers = [str(mim) for mim in df['mimNumber']]
 
-# Iterate over the rows of the dataframe
-for index, row in df.iterrows():
-    mim_number = row['mimNumber']
-    url = f'https://omim.org/entry/{mim_number}'
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-        'Accept-Language': 'en-US,en;q=0.5',
-        'Accept-Encoding': 'gzip, deflate, br',
-        'Connection': 'keep-alive',
-        'Upgrade-Insecure-Requests': '1'
-    }
-    try:
-        # Fetch the HTML content
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()  # Check if the request was successful
-        html_content = response.text
-        
-        # Parse the HTML content
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        # Find the UniProt ID
-        uniprot_link = soup.find('a', href=lambda href: href and 'uniprot.org/uniprotkb/' in href)
-        if uniprot_link:
-            uniprot_id = uniprot_link['href'].split('/')[-1]
-        else:
-            uniprot_id = None
-        
-    except requests.RequestException as e:
-        print(f"Failed to fetch data for MIM number {mim_number}: {e}")
-        uniprot_id = None
-    
-    # Append the UniProt ID to the list
-    uniprot_ids.append(uniprot_id)
-    
-    # Create a new row with the UniProt ID
-    new_row = row.to_dict()
-    new_row['uniprot_id'] = uniprot_id
-    
-    # Append the new row to the output dataframe
-    output_df = pd.concat([output_df, pd.DataFrame([new_row])], ignore_index=True)
-    
-    # Save the updated dataframe to the CSV file after each iteration
-    output_df.to_csv(output_file, index=False)
-    time.sleep(random.uniform(1, 4))  # Randomized delay between 1 and 4 seconds
+    resolved = resolve_mim_numbers(mim_numbers, load_checkpoint(), workers=args.workers, delay=args.delay)
+    compact(df, resolved)
 
-print(f"Updated CSV file has been saved to {output_file}")
\ No newline at end of file
+    print(f"Updated CSV file has been saved to {output_file}")
+    print(default_cache.report())
@@ -0,0 +1,235 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from email.utils import formatdate
+from typing import Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+
+cache_dir = os.getenv('HTTP_CACHE_DIR', './data/http_cache')
+default_ttl = float(os.getenv('HTTP_CACHE_TTL', 7 * 24 * 3600))  # Seconds before a cached response is revalidated
+max_cache_bytes = int(os.getenv('HTTP_CACHE_MAX_BYTES', 1 << 30))
+cache_disabled = os.getenv('HTTP_CACHE_DISABLED', '') not in ('', '0')
+
+secret_params = {'apikey', 'api_key', 'key', 'token'}  # Never part of the cache key or stored URL
+
+def sanitize_url(url: str, params: Optional[Dict] = None) -> str:
+    """Merge params into the URL, drop API keys and sort the query so equal requests share a key."""
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if params:
+        query += [(str(k), str(v)) for k, v in params.items() if v is not None]
+    query = sorted((k, v) for k, v in query if k.lower() not in secret_params)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ''))
+
+class CachedResponse:
+    """The subset of requests.Response the fetch scripts use, served from the cache."""
+
+    def __init__(self, url: str, status_code: int, headers: Dict, content: bytes, encoding: Optional[str]):
+        self.url = url
+        self.status_code = status_code
+        self.headers = requests.structures.CaseInsensitiveDict(headers)
+        self.content = content
+        self.encoding = encoding
+        self.from_cache = True
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
+
+    def json(self):
+        return json.loads(self.text)
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error for url: {self.url}", response=self)
+
+class HttpCache:
+    """Content store of successful GET responses keyed by sanitized URL, with TTL, revalidation and LRU eviction.
+
+    One instance is shared by the fetch threads of a script; a lock guards the counters, the size
+    bookkeeping and eviction.
+    """
+
+    def __init__(self, directory: str = cache_dir, ttl: float = default_ttl, max_bytes: int = max_cache_bytes):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0, "revalidated": 0, "stored": 0, "evicted": 0}
+        self.total_bytes = None  # Computed on first store
+        self.lock = threading.RLock()
+
+    def count(self, name: str) -> None:
+        with self.lock:
+            self.stats[name] += 1
+
+    def paths(self, key: str) -> tuple:
+        prefix = os.path.join(self.directory, key[:2], key)
+        return f"{prefix}.json", f"{prefix}.body"
+
+    def load(self, key: str) -> Optional[tuple]:
+        """Return (metadata, body) for a cached key, or None."""
+        meta_path, body_path = self.paths(key)
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            with open(body_path, 'rb') as f:
+                body = f.read()
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        try:
+            os.utime(meta_path)  # Mark as recently used for LRU eviction
+        except FileNotFoundError:
+            pass  # Evicted by another thread after it was read
+        return meta, body
+
+    def lookup(self, url: str, params: Optional[Dict] = None, ttl: Optional[float] = None) -> Optional[CachedResponse]:
+        """Return a fresh cached response without touching the network, counting the hit or miss."""
+        key_url = sanitize_url(url, params)
+        cached = self.load(hashlib.sha256(key_url.encode()).hexdigest())
+        ttl = self.ttl if ttl is None else ttl
+        if cached is not None and time.time() - cached[0]["fetched_at"] < ttl:
+            self.count("hits")
+            return self.to_response(*cached)
+        self.count("misses")
+        return None
+
+    def store(self, url: str, params: Optional[Dict], status_code: int, headers: Dict, body: bytes,
+              encoding: Optional[str]) -> None:
+        """Store a response body and its validators."""
+        key_url = sanitize_url(url, params)
+        key = hashlib.sha256(key_url.encode()).hexdigest()
+        meta_path, body_path = self.paths(key)
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        meta = {
+            "url": key_url,
+            "status_code": status_code,
+            "headers": {k: v for k, v in headers.items() if k.lower() in ('content-type', 'etag', 'last-modified')},
+            "encoding": encoding,
+            "fetched_at": time.time(),
+            "size": len(body)
+        }
+        with self.lock:
+            previous_size = os.path.getsize(body_path) if os.path.exists(body_path) else 0
+            with open(f"{body_path}.tmp", 'wb') as f:
+                f.write(body)
+            os.replace(f"{body_path}.tmp", body_path)
+            with open(f"{meta_path}.tmp", 'w') as f:
+                json.dump(meta, f)
+            os.replace(f"{meta_path}.tmp", meta_path)
+            self.stats["stored"] += 1
+
+            if self.total_bytes is None:
+                self.total_bytes = self.disk_usage()
+            else:
+                self.total_bytes += len(body) - previous_size
+            if self.total_bytes > self.max_bytes:
+                self.evict()
+
+    def touch(self, key: str, meta: Dict) -> None:
+        """Restart the TTL of a revalidated entry."""
+        meta["fetched_at"] = time.time()
+        meta_path, _ = self.paths(key)
+        with open(meta_path, 'w') as f:
+            json.dump(meta, f)
+
+    def to_response(self, meta: Dict, body: bytes) -> CachedResponse:
+        return CachedResponse(meta["url"], meta["status_code"], meta["headers"], body, meta["encoding"])
+
+    def entries(self) -> list:
+        """List (last_used, size, key) for every cached entry, skipping entries removed while listing."""
+        result = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith('.json'):
+                    meta_path = os.path.join(root, name)
+                    body_path = meta_path[:-len('.json')] + '.body'
+                    try:
+                        last_used = os.path.getmtime(meta_path)
+                    except FileNotFoundError:
+                        continue
+                    try:
+                        size = os.path.getsize(body_path)
+                    except FileNotFoundError:
+                        size = 0
+                    result.append((last_used, size, name[:-len('.json')]))
+        return result
+
+    def disk_usage(self) -> int:
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self) -> None:
+        """Remove least recently used entries until the cache is below 90% of its size limit."""
+        with self.lock:
+            entries = sorted(self.entries())
+            total = sum(size for _, size, _ in entries)
+            target = self.max_bytes * 0.9
+            for _, size, key in entries:
+                if total <= target:
+                    break
+                for path in self.paths(key):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                total -= size
+                self.stats["evicted"] += 1
+            self.total_bytes = total
+
+    def get(self, url: str, params: Optional[Dict] = None, headers: Optional[Dict] = None,
+            session=None, ttl: Optional[float] = None, **kwargs):
+        """GET through the cache: fresh entries are served locally, stale ones revalidated with ETag/Last-Modified."""
+        session = session or requests
+        key_url = sanitize_url(url, params)
+        key = hashlib.sha256(key_url.encode()).hexdigest()
+        cached = self.load(key)
+        ttl = self.ttl if ttl is None else ttl
+
+        request_headers = dict(headers or {})
+        if cached is not None:
+            meta, body = cached
+            if time.time() - meta["fetched_at"] < ttl:
+                self.count("hits")
+                return self.to_response(meta, body)
+            validators = {k.lower(): v for k, v in meta["headers"].items()}
+            if 'etag' in validators:
+                request_headers['If-None-Match'] = validators['etag']
+            if 'last-modified' in validators:
+                request_headers['If-Modified-Since'] = validators['last-modified']
+            elif 'etag' not in validators:
+                request_headers['If-Modified-Since'] = formatdate(meta["fetched_at"], usegmt=True)
+
+        response = session.get(url, params=params, headers=request_headers, **kwargs)
+        if cached is not None and response.status_code == 304:
+            self.count("revalidated")
+            self.touch(key, cached[0])
+            return self.to_response(*cached)
+
+        self.count("misses")
+        response.from_cache = False
+        if response.status_code == 200:
+            self.store(url, params, response.status_code, response.headers, response.content,
+                       response.encoding or response.apparent_encoding)
+        return response
+
+    def report(self) -> str:
+        return (f"HTTP cache: {self.stats['hits']} hits, {self.stats['misses']} misses, "
+                f"{self.stats['revalidated']} revalidated, {self.stats['stored']} stored, "
+                f"{self.stats['evicted']} evicted")
+
+default_cache = HttpCache()
+
+def cached_get(url: str, params: Optional[Dict] = None, headers: Optional[Dict] = None, session=None,
+               ttl: Optional[float] = None, **kwargs):
+    """requests.get replacement used by the fetch scripts; bypasses the cache when HTTP_CACHE_DISABLED is set.
+
+    ttl overrides the cache TTL for this request; 0 always revalidates.
+    """
+    if cache_disabled:
+        response = (session or requests).get(url, params=params, headers=headers, **kwargs)
+        response.from_cache = False
+        return response
+    return default_cache.get(url, params=params, headers=headers, session=session, ttl=ttl, **kwargs)
@@ -1,16 +1,39 @@
 import json
 import csv
 import os
-from typing import Dict
+import sys
+import argparse
+import hashlib
+import time
+from typing import Callable, Dict, Iterable, Iterator, Optional
 import re
+import itertools
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from alignment_cache import file_fingerprint, load_alignment_cache, load_manifest, save_alignment_cache, save_manifest
+from run_profile import RunProfile
 protein_change_pattern = re.compile(r'^[A-Z]\d+[A-Z]$')
 
 n = 4  # Number of characters before and after the alignment position for the matched property
 
+coordinate_indexes = {}  # Uniprot ID -> (sequence, coordinate index), filled by parse_fasta_file
+
+unmatched_file_path = './data/unmatched_protein_changes.csv'
+unmatched_flush_threshold = 1000  # Buffered unmatched rows before they are written out
+
+omim_found_file_path = './data/omim_ids_found_with_uniprot.csv'
+omim_notfound_file_path = './data/omim_ids_notfound_with_uniprot.csv'
+
+manifest_file_path = './data/kinsnps_allinfo_manifest.json'
+clinvar_cache_dir = './data/kinsnps_allinfo_cache'
+clinvar_cache_version = 1  # Bump when the ClinVar parsing changes so cached results are rebuilt
+
+json_output_formats = ('pretty', 'compact', 'jsonl')
+
 def extract_sequence_info(sequence: str) -> tuple:
     """Extract kinase domain and flanking positions from sequence."""
     flanking_positions = []
-    kinase_domain = ""
+    kinase_domain = []
     kinase_start = -1
     kinase_end = -1
     pos = 1
@@ -34,16 +57,36 @@ def extract_sequence_info(sequence: str) -> tuple:
             else:
                 if kinase_start == -1:
                     kinase_start = pos
-                kinase_domain += char
+                kinase_domain.append(char)
                 pos += 1
                 
     if kinase_end == -1:
         kinase_end = pos - 1
         
-    return flanking_positions, kinase_domain, kinase_start, kinase_end
+    return flanking_positions, ''.join(kinase_domain), kinase_start, kinase_end
+
+def parse_fasta_file(fasta_file_path: str, use_cache: bool = True, vectorized: bool = False) -> Dict:
+    """Parse FASTA file and extract protein information, reusing the compiled cache when valid."""
+    cache_name = 'parsed_numpy' if vectorized else 'parsed'  # Each extractor keeps its own cache
+    if use_cache:
+        cached = load_alignment_cache(fasta_file_path, cache_name)
+        if cached is not None:
+            coordinate_indexes.update(cached["coordinate_indexes"])
+            return cached["uniprot_info"]
+
+    uniprot_info = parse_fasta_text(fasta_file_path, vectorized)
+    if use_cache and uniprot_info:
+        save_alignment_cache(fasta_file_path, {
+            "uniprot_info": uniprot_info,
+            "coordinate_indexes": {uniprot_id: coordinate_indexes[uniprot_id] for uniprot_id in uniprot_info}
+        }, cache_name)
+    return uniprot_info
+
+def parse_fasta_text(fasta_file_path: str, vectorized: bool = False) -> Dict:
+    """Parse the FASTA/.mma text and extract protein information, optionally with the NumPy extractor."""
+    if vectorized:
+        from alignment_numpy import extract_alignment_info
 
-def parse_fasta_file(fasta_file_path: str) -> Dict:
-    """Parse FASTA file and extract protein information."""
     uniprot_info = {}
     try:
         with open(fasta_file_path, 'r') as file:
@@ -57,8 +100,13 @@ def parse_fasta_file(fasta_file_path: str) -> Dict:
                         sequence = next(file).strip()
                         sequence = sequence[sequence.index("{")+1:sequence.index("}")]
                         
-                        flanking_positions, kinase_domain, kinase_start, kinase_end = extract_sequence_info(sequence)
-                        kinase_domain_alignment = ''.join(c for c in kinase_domain if c.isupper() or c == '-')
+                        if vectorized:
+                            flanking_positions, kinase_domain, kinase_start, kinase_end, kinase_domain_alignment = \
+                                extract_alignment_info(sequence)
+                        else:
+                            flanking_positions, kinase_domain, kinase_start, kinase_end = extract_sequence_info(sequence)
+                            kinase_domain_alignment = ''.join(c for c in kinase_domain if c.isupper() or c == '-')
+                        coordinate_indexes[current_id] = (sequence, build_coordinate_index(sequence, flanking_positions))
                         
                         uniprot_info[current_id] = {
                             "uniprot_id": current_id,
@@ -82,24 +130,65 @@ def parse_fasta_file(fasta_file_path: str) -> Dict:
         return {}
     return uniprot_info
 
-def get_alignment_position(sequence: str, marker_pos: int) -> int:
-    """Calculate alignment position in sequence."""
+def build_coordinate_index(sequence: str, flanking_positions: list) -> Dict:
+    """Map each full-sequence position to its alignment column and flanking flag."""
+    alignment_positions = array('i')
     alignment_pos = 0
     inside_parentheses = False
-    
-    for i, c in enumerate(sequence):
+
+    for c in sequence:
         if c == '(':
             inside_parentheses = True
         elif c == ')':
             inside_parentheses = False
         elif not inside_parentheses and (c.isupper() or c == '-'):
             alignment_pos += 1
-        if i == marker_pos:
-            break
-    return alignment_pos
+        if c not in '() -':
+            alignment_positions.append(alignment_pos)
 
-def parse_subs_file(subs_file_path: str, uniprot_info: Dict) -> Dict:
-    """Parse substitutions file and update protein information."""
+    # Flanking ranges are counted with dashes, so they may extend past the last residue
+    flanking_end = max((region["end"] for region in flanking_positions), default=0)
+    in_flanking = bytearray(max(flanking_end, len(alignment_positions)) + 1)
+    for region in flanking_positions:
+        # A sequence starting with ")" gives a flanking range starting at -1
+        for pos in range(max(region["start"], 0), region["end"] + 1):
+            in_flanking[pos] = 1
+
+    return {
+        "alignment_positions": alignment_positions,
+        "in_flanking": in_flanking,
+        "alignment_length": alignment_pos
+    }
+
+def get_coordinate_index(uniprot_info: Dict, uniprot_id: str) -> Dict:
+    """Return the coordinate index of a protein, building it if parse_fasta_file did not.
+
+    Indexes are stored with the sequence they were built from, so a protein parsed from another
+    alignment never gets a stale index.
+    """
+    protein = uniprot_info[uniprot_id]
+    cached = coordinate_indexes.get(uniprot_id)
+    if cached is not None and cached[0] == protein["sequence"]:
+        return cached[1]
+    index = build_coordinate_index(protein["sequence"], protein["flanking_positions"])
+    coordinate_indexes[uniprot_id] = (protein["sequence"], index)
+    return index
+
+def locate_substitution(index: Dict, full_sequence_pos: int) -> tuple:
+    """Look up the alignment position and location of a full-sequence position."""
+    if 1 <= full_sequence_pos <= len(index["alignment_positions"]):
+        alignment_pos = index["alignment_positions"][full_sequence_pos - 1]
+    else:
+        # Positions outside of the sequence get the number of alignment columns of the whole sequence
+        alignment_pos = index["alignment_length"]
+
+    if 0 <= full_sequence_pos < len(index["in_flanking"]) and index["in_flanking"][full_sequence_pos]:
+        return "Outside of the alignment", "flanking_region"
+    return alignment_pos, "kinase_domain"
+
+def parse_subs_file(subs_file_path: str, uniprot_info: Dict, counters: Optional[Dict] = None) -> Dict:
+    """Parse substitutions file and update protein information; counts rows into counters if given."""
+    rows = malformed = unknown = substitutions = 0
     try:
         with open(subs_file_path, 'r') as file:
             next(file)  # Skip header
@@ -107,45 +196,34 @@ def parse_subs_file(subs_file_path: str, uniprot_info: Dict) -> Dict:
                 if not line:
                     continue
                     
+                rows += 1
                 parts = line.split()
-                if len(parts) == 4:
-                    uniprot_id, from_aa, full_sequence_pos, to_aa = parts
-                    full_sequence_pos = int(full_sequence_pos)
-                    
-                    if uniprot_id not in uniprot_info:
-                        continue
-
-                    sequence = uniprot_info[uniprot_id]["sequence"]
-                    # Calculate letter_count first
-                    current_count = 0
-                    for i, c in enumerate(sequence):
-                        if c not in '() -':
-                            current_count += 1
-                            if current_count == full_sequence_pos:
-                                marker_pos = i
-                                break
-                    else:
-                        marker_pos = -1
-                    
-                    alignment_pos = get_alignment_position(sequence, marker_pos)
-                    
-                    location = "kinase_domain"
-                    for region in uniprot_info[uniprot_id]["flanking_positions"]:
-                        if region["start"] <= full_sequence_pos <= region["end"]:
-                            location = "flanking_region"
-                            alignment_pos = "Outside of the alignment"
-                            break
-                    
-                    uniprot_info[uniprot_id]["substitutions"].append({
-                        "full_sequence_pos": full_sequence_pos,
-                        "alignment_pos": alignment_pos,
-                        "from": from_aa,
-                        "to": to_aa,
-                        "location": location,
-                        "database": "OMIM"
-                    })
+                if len(parts) != 4:
+                    malformed += 1
+                    continue
+                uniprot_id, from_aa, full_sequence_pos, to_aa = parts
+                full_sequence_pos = int(full_sequence_pos)
+                
+                if uniprot_id not in uniprot_info:
+                    unknown += 1
+                    continue
+
+                index = get_coordinate_index(uniprot_info, uniprot_id)
+                alignment_pos, location = locate_substitution(index, full_sequence_pos)
+                
+                uniprot_info[uniprot_id]["substitutions"].append({
+                    "full_sequence_pos": full_sequence_pos,
+                    "alignment_pos": alignment_pos,
+                    "from": from_aa,
+                    "to": to_aa,
+                    "location": location,
+                    "database": "OMIM"
+                })
+                substitutions += 1
     except FileNotFoundError:
         print(f"Error: Could not find file {subs_file_path}")
+    if counters is not None:
+        counters.update(rows_read=rows, substitutions=substitutions, unknown_uniprot_ids=unknown, malformed_rows=malformed)
     return uniprot_info
 
 def create_omim_uniprot_mapping() -> Dict[str, str]:
@@ -153,13 +231,13 @@ def create_omim_uniprot_mapping() -> Dict[str, str]:
     mapping = {}
     
     # Process found mappings
-    with open('./data/omim_ids_found_with_uniprot.csv', 'r') as file:
+    with open(omim_found_file_path, 'r') as file:
         reader = csv.DictReader(file)
         for row in reader:
             mapping[row['mimNumber']] = row['uniprot_id']
     
     # Process not found mappings
-    with open('./data/omim_ids_notfound_with_uniprot.csv', 'r') as file:
+    with open(omim_notfound_file_path, 'r') as file:
         reader = csv.DictReader(file)
         for row in reader:
             if 'uniprot_id' in row and row['uniprot_id']:  # Only if uniprot_id exists
@@ -167,101 +245,413 @@ def create_omim_uniprot_mapping() -> Dict[str, str]:
     
     return mapping
 
-def parse_clinvar_file(clinvar_file_path: str, uniprot_id: str, uniprot_info: Dict, omim_id: str) -> None:
+def read_clinvar_protein_changes(clinvar_file_path: str,
+                                 on_unmatched: Optional[Callable[[str], None]] = None,
+                                 column: str = 'Protein change') -> Iterator[tuple]:
+    """Stream (from, pos, to) tuples from the protein change column of a ClinVar TSV export."""
+    with open(clinvar_file_path, 'r') as file:
+        header = next(file, '').rstrip('\r\n').split('\t')
+        if column not in header:
+            return
+        col = header.index(column)
+
+        for line in file:
+            if '"' in line:
+                # Quoted fields may hold tabs or newlines, let csv consume this record
+                parts = next(csv.reader(itertools.chain([line], file), delimiter='\t'), [])
+            else:
+                parts = line.split('\t', col + 1)
+            if len(parts) <= col:
+                continue
+            protein_changes_str = parts[col].rstrip('\r\n')
+            if not protein_changes_str:  # Skip empty protein changes
+                continue
+
+            for protein_change in protein_changes_str.split(','):
+                protein_change = protein_change.strip()
+                if not protein_change_pattern.match(protein_change):
+                    if on_unmatched is not None:
+                        on_unmatched(protein_change)
+                    continue
+                yield protein_change[0], int(protein_change[1:-1]), protein_change[-1]
+
+class UnmatchedProteinChangeWriter:
+    """Buffered, deduplicating sink for protein changes that are not simple substitutions."""
+
+    def __init__(self, file_path: str = unmatched_file_path, flush_threshold: int = unmatched_flush_threshold):
+        self.file_path = file_path
+        self.flush_threshold = max(1, flush_threshold)
+        self.rows_written = 0
+        self.buffer = []
+        self.seen = set()
+
+        if os.path.exists(file_path):
+            # Rows from previous runs count as seen, so reruns do not append them again
+            with open(file_path, 'r', newline='') as f:
+                reader = csv.reader(f)
+                next(reader, None)  # Skip header
+                for row in reader:
+                    if len(row) == 3:
+                        self.seen.add((row[0], row[2]))
+            self.file = open(file_path, 'a', newline='')
+            self.writer = csv.writer(self.file)
+        else:
+            self.file = open(file_path, 'w', newline='')
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(['uniprot_id', 'omim_id', 'protein_change'])
+
+    def write(self, uniprot_id: str, omim_id: str, protein_change: str) -> None:
+        """Queue a row unless the (uniprot_id, protein_change) pair was already recorded."""
+        key = (uniprot_id, protein_change)
+        if key in self.seen:
+            return
+        self.seen.add(key)
+        self.buffer.append((uniprot_id, omim_id, protein_change))
+        if len(self.buffer) >= self.flush_threshold:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write buffered rows to disk."""
+        if self.buffer:
+            self.writer.writerows(self.buffer)
+            self.rows_written += len(self.buffer)
+            self.buffer.clear()
+        self.file.flush()
+
+    def close(self) -> None:
+        """Flush remaining rows and close the file."""
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def collect_clinvar_substitutions(clinvar_file_path: str, index: Dict) -> tuple:
+    """Read a ClinVar file and return its substitutions and unmatched protein changes."""
+    substitutions = []
+    unmatched = []
+    for from_aa, full_sequence_pos, to_aa in read_clinvar_protein_changes(clinvar_file_path, unmatched.append):
+        alignment_pos, location = locate_substitution(index, full_sequence_pos)
+        substitutions.append({
+            "full_sequence_pos": full_sequence_pos,
+            "alignment_pos": alignment_pos,
+            "from": from_aa,
+            "to": to_aa,
+            "location": location,
+            "database": "ClinVar"
+        })
+    return substitutions, unmatched
+
+def parse_clinvar_file(clinvar_file_path: str, uniprot_id: str, uniprot_info: Dict, omim_id: str,
+                       unmatched_writer: Optional[UnmatchedProteinChangeWriter] = None) -> None:
     """Parse ClinVar file and add substitutions to uniprot_info."""
     print(f"Processing: Uniprot ID: {uniprot_id}, OMIM ID: {omim_id}")
     
-    unmatched_file = './data/unmatched_protein_changes.csv'
-    if not os.path.exists(unmatched_file):
-        with open(unmatched_file, 'w', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(['uniprot_id', 'omim_id', 'protein_change'])
-
     try:
-        with open(clinvar_file_path, 'r') as file:
-            reader = csv.DictReader(file, delimiter='\t')
-            for row in reader:
-                protein_changes_str = row['Protein change']
-                if not protein_changes_str:  # Skip empty protein changes
-                    continue
-                
-                # Split the protein changes and process each one
-                protein_changes = [change.strip() for change in protein_changes_str.split(',')]
-                
-                for protein_change in protein_changes:
-                    if not protein_change_pattern.match(protein_change):
-                        # Log only non-empty unmatched protein changes
-                        with open(unmatched_file, 'a', newline='') as f:
-                            writer = csv.writer(f)
-                            writer.writerow([uniprot_id, omim_id, protein_change])
-                        continue
-                    
-                    try:
-                        full_sequence_pos = int(''.join(c for c in protein_change if c.isdigit()))
-                        from_aa = protein_change[0]  # First letter
-                        to_aa = protein_change[-1]   # Last letter
-                        
-                        sequence = uniprot_info[uniprot_id]["sequence"]
-                        # Calculate marker position
-                        current_count = 0
-                        for i, c in enumerate(sequence):
-                            if c not in '() -':
-                                current_count += 1
-                                if current_count == full_sequence_pos:
-                                    marker_pos = i
-                                    break
-                        else:
-                            marker_pos = -1
-                        
-                        alignment_pos = get_alignment_position(sequence, marker_pos)
-                        
-                        # Determine location
-                        location = "kinase_domain"
-                        for region in uniprot_info[uniprot_id]["flanking_positions"]:
-                            if region["start"] <= full_sequence_pos <= region["end"]:
-                                location = "flanking_region"
-                                alignment_pos = "Outside of the alignment"
-                                break
-                        
-                        uniprot_info[uniprot_id]["substitutions"].append({
-                            "full_sequence_pos": full_sequence_pos,
-                            "alignment_pos": alignment_pos,
-                            "from": from_aa,
-                            "to": to_aa,
-                            "location": location,
-                            "database": "ClinVar"
-                        })
-                    except (ValueError, KeyError) as e:
-                        print(f"Error processing protein change {protein_change} in {clinvar_file_path}: {e}")
-                        continue
+        index = get_coordinate_index(uniprot_info, uniprot_id)
+        substitutions, unmatched = collect_clinvar_substitutions(clinvar_file_path, index)
     except FileNotFoundError:
         print(f"Warning: Could not find ClinVar file {clinvar_file_path}")
+        return
+    except KeyError as e:
+        print(f"Error processing {clinvar_file_path}: unknown Uniprot ID {e}")
+        return
+
+    merge_clinvar_result(uniprot_info, uniprot_id, omim_id, substitutions, unmatched, unmatched_writer)
+
+def merge_clinvar_result(uniprot_info: Dict, uniprot_id: str, omim_id: str, substitutions: list, unmatched: list,
+                         unmatched_writer: Optional[UnmatchedProteinChangeWriter] = None) -> None:
+    """Append parsed ClinVar substitutions to uniprot_info and log the unmatched protein changes."""
+    owns_writer = unmatched_writer is None
+    if owns_writer:
+        unmatched_writer = UnmatchedProteinChangeWriter()
+    try:
+        for protein_change in unmatched:
+            unmatched_writer.write(uniprot_id, omim_id, protein_change)
+    finally:
+        if owns_writer:
+            unmatched_writer.close()
+
+    uniprot_info[uniprot_id]["substitutions"].extend(substitutions)
+
+def substitution_sources(sub: Dict) -> list:
+    """Return [{"database", "count"}] for a merged record, or its single database with count 1."""
+    return sub.get("sources") or [{"database": sub.get("database", "OMIM"), "count": 1}]
+
+def merge_substitutions(substitutions: list) -> list:
+    """Collapse identical (full_sequence_pos, from, to) substitutions into one record with a "sources" list.
 
-def add_clinvar_substitutions(uniprot_info: Dict) -> Dict:
-    """Add ClinVar substitutions to uniprot_info."""
+    Records keep the position of their first occurrence. Records that collapsed more than one report
+    replace "database" with "sources", listing each database once with the number of times it reported
+    the change; single reports keep "database" and are written unchanged to keep the output small.
+    Merging is idempotent.
+    """
+    merged = {}
+    counts = {}
+    for sub in substitutions:
+        key = (sub["full_sequence_pos"], sub["from"], sub["to"])
+        if key not in merged:
+            merged[key] = {name: value for name, value in sub.items() if name not in ("database", "sources")}
+            counts[key] = {}
+        key_counts = counts[key]
+        for source in substitution_sources(sub):
+            key_counts[source["database"]] = key_counts.get(source["database"], 0) + source["count"]
+    for key, record in merged.items():
+        if sum(counts[key].values()) > 1:
+            record["sources"] = [{"database": database, "count": count} for database, count in counts[key].items()]
+        else:
+            record["database"] = next(iter(counts[key]))
+    return list(merged.values())
+
+def merge_duplicate_substitutions(uniprot_info: Dict) -> int:
+    """Merge the substitutions of every protein in place; returns the number of records removed."""
+    removed = 0
+    for protein in uniprot_info.values():
+        substitutions = merge_substitutions(protein["substitutions"])
+        removed += len(protein["substitutions"]) - len(substitutions)
+        protein["substitutions"] = substitutions
+    return removed
+
+def _collect_clinvar_job(job: tuple) -> Optional[tuple]:
+    """Process pool entry point: parse one kinase's ClinVar file, or None if it is missing."""
+    clinvar_file_path, index = job
+    try:
+        return collect_clinvar_substitutions(clinvar_file_path, index)
+    except FileNotFoundError:
+        return None
+
+def get_input_fingerprints(input_paths: list, previous: Optional[Dict] = None) -> Dict:
+    """Fingerprint every input file, reusing unchanged hashes from a previous manifest."""
+    previous = previous or {}
+    return {path: file_fingerprint(path, previous.get(path)) for path in input_paths}
+
+def get_clinvar_jobs(uniprot_info: Dict) -> list:
+    """List (uniprot_id, omim_id, clinvar_file_path) for every protein with a ClinVar file mapping."""
     omim_uniprot_mapping = create_omim_uniprot_mapping()
     
     # Create reverse mapping (Uniprot -> OMIM)
     uniprot_omim_mapping = {v: k for k, v in omim_uniprot_mapping.items()}
     
+    jobs = []
     for uniprot_id in uniprot_info:
         if uniprot_id in uniprot_omim_mapping:
             omim_id = uniprot_omim_mapping[uniprot_id]
-            clinvar_file_path = f'./data/clinvar/{omim_id}.txt'
-            parse_clinvar_file(clinvar_file_path, uniprot_id, uniprot_info, omim_id)
+            jobs.append((uniprot_id, omim_id, f'./data/clinvar/{omim_id}.txt'))
+    return jobs
+
+def run_clinvar_jobs(jobs: list, uniprot_info: Dict, workers: int = 1) -> Iterator[Optional[tuple]]:
+    """Yield (substitutions, unmatched) for each job in order, or None if its file is missing."""
+    pool_jobs = [(clinvar_file_path, get_coordinate_index(uniprot_info, uniprot_id))
+                 for uniprot_id, _, clinvar_file_path in jobs]
+    if workers <= 1:
+        yield from map(_collect_clinvar_job, pool_jobs)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # map keeps submission order, so the merge matches the serial path
+        yield from executor.map(_collect_clinvar_job, pool_jobs, chunksize=4)
+
+def clinvar_cache_key(protein: Dict, omim_id: str, clinvar_fingerprint: Dict) -> str:
+    """Key a cached ClinVar result on everything it depends on."""
+    key_parts = [clinvar_cache_version, protein["sequence"], omim_id, clinvar_fingerprint["sha256"]]
+    return hashlib.sha256(json.dumps(key_parts).encode()).hexdigest()
+
+def load_cached_clinvar_result(cache_dir: str, uniprot_id: str, key: str) -> Optional[tuple]:
+    """Return a cached (substitutions, unmatched) pair if it was stored under the same key."""
+    try:
+        with open(os.path.join(cache_dir, f'{uniprot_id}.json'), 'r') as file:
+            cached = json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if cached.get("key") != key:
+        return None
+    return cached["substitutions"], cached["unmatched"]
+
+def save_cached_clinvar_result(cache_dir: str, uniprot_id: str, key: str, result: tuple) -> None:
+    """Store a kinase's ClinVar result for later incremental runs."""
+    substitutions, unmatched = result
+    with open(os.path.join(cache_dir, f'{uniprot_id}.json'), 'w') as file:
+        json.dump({"key": key, "substitutions": substitutions, "unmatched": unmatched}, file)
+
+def add_clinvar_substitutions(uniprot_info: Dict, unmatched_flush_threshold: int = unmatched_flush_threshold,
+                              workers: int = 1, cache_dir: Optional[str] = None,
+                              fingerprints: Optional[Dict] = None, counters: Optional[Dict] = None) -> Dict:
+    """Add ClinVar substitutions to uniprot_info, optionally in a process pool and reusing cached kinases.
+
+    counters, if given, receives the number of kinases, missing files and protein changes read and matched.
+    """
+    jobs = get_clinvar_jobs(uniprot_info)
+    missing_files = 0
+    results = [None] * len(jobs)
+    pending = list(range(len(jobs)))
+
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        fingerprints = fingerprints if fingerprints is not None else {}
+        keys = {}
+        pending = []
+        for i, (uniprot_id, omim_id, clinvar_file_path) in enumerate(jobs):
+            fingerprint = fingerprints.get(clinvar_file_path) or file_fingerprint(clinvar_file_path)
+            if fingerprint is None:
+                pending.append(i)  # Missing file, reported below
+                continue
+            keys[i] = clinvar_cache_key(uniprot_info[uniprot_id], omim_id, fingerprint)
+            results[i] = load_cached_clinvar_result(cache_dir, uniprot_id, keys[i])
+            if results[i] is None:
+                pending.append(i)
+        print(f"Reusing {len(jobs) - len(pending)} cached kinases, parsing {len(pending)}")
+
+    pending_jobs = [jobs[i] for i in pending]
+    for i, result in zip(pending, run_clinvar_jobs(pending_jobs, uniprot_info, workers)):
+        uniprot_id, omim_id, clinvar_file_path = jobs[i]
+        print(f"Processing: Uniprot ID: {uniprot_id}, OMIM ID: {omim_id}")
+        if result is None:
+            print(f"Warning: Could not find ClinVar file {clinvar_file_path}")
+            missing_files += 1
+            continue
+        results[i] = result
+        if cache_dir is not None:
+            save_cached_clinvar_result(cache_dir, uniprot_id, keys[i], result)
+
+    with UnmatchedProteinChangeWriter(flush_threshold=unmatched_flush_threshold) as unmatched_writer:
+        for (uniprot_id, omim_id, _), result in zip(jobs, results):
+            if result is not None:
+                substitutions, unmatched = result
+                merge_clinvar_result(uniprot_info, uniprot_id, omim_id, substitutions, unmatched, unmatched_writer)
+    print(f"Wrote {unmatched_writer.rows_written} unmatched protein changes to {unmatched_writer.file_path}")
+    if counters is not None:
+        matched = sum(len(result[0]) for result in results if result is not None)
+        unmatched = sum(len(result[1]) for result in results if result is not None)
+        counters.update(kinases=len(jobs), cached_kinases=len(jobs) - len(pending), missing_files=missing_files,
+                        protein_changes_read=matched + unmatched, substitutions=matched, unmatched=unmatched,
+                        unmatched_rows_written=unmatched_writer.rows_written)
     
     return uniprot_info
 
+def iter_proteins(json_file_path: str) -> Iterator[Dict]:
+    """Read proteins from a JSON list or a JSON Lines file written by kinsnps_allinfo.py."""
+    with open(json_file_path, 'r') as file:
+        if json_file_path.endswith('.jsonl'):
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from json.load(file)
+
+def write_json_output(proteins: Iterable[Dict], output_file_path: str, output_format: str = 'pretty') -> tuple:
+    """Write protein records one at a time and return the output size in bytes and the time taken."""
+    if output_format not in json_output_formats:
+        raise ValueError(f"Unknown output format {output_format}, expected one of {', '.join(json_output_formats)}")
+
+    start_time = time.perf_counter()
+    with open(output_file_path, 'w') as json_file:
+        if output_format == 'jsonl':
+            for protein in proteins:
+                json_file.write(json.dumps(protein, separators=(',', ':')))
+                json_file.write('\n')
+        else:
+            count = 0
+            for protein in proteins:
+                if output_format == 'pretty':
+                    # Same layout as json.dump(list, indent=4): each record indented one level
+                    record = json.dumps(protein, indent=4).replace('\n', '\n    ')
+                    json_file.write(('[\n    ' if count == 0 else ',\n    ') + record)
+                else:
+                    record = json.dumps(protein, separators=(',', ':'))
+                    json_file.write(('[' if count == 0 else ',') + record)
+                count += 1
+            if count == 0:
+                json_file.write('[]')
+            else:
+                json_file.write('\n]' if output_format == 'pretty' else ']')
+    return os.path.getsize(output_file_path), time.perf_counter() - start_time
+
 if __name__ == "__main__":
-    fasta_file_path = './kinsnps/subkinsnps.mma'
+    parser = argparse.ArgumentParser(description="Build the kinsnps_allinfo JSON from the alignment, OMIM and ClinVar data")
+    parser.add_argument('--workers', '-w', type=int, default=1,
+                      help='Number of processes used to parse ClinVar files (default: 1, serial)')
+    parser.add_argument('--numpy', action='store_true',
+                      help='Extract alignment columns with the NumPy implementation in alignment_numpy.py')
+    parser.add_argument('--parquet', type=str, default=None,
+                      help='Also write substitutions.parquet and proteins.parquet to this directory (requires pyarrow)')
+    parser.add_argument('--alignment', '-a', type=str, default='./kinsnps/subkinsnps.mma',
+                      help='Aligned .mma file of the kinases (default: ./kinsnps/subkinsnps.mma)')
+    parser.add_argument('--output', '-o', type=str, default=None,
+                      help='Path to output file (default: ./data/kinsnps_allinfo_twodbs.json, .jsonl for --format jsonl)')
+    parser.add_argument('--format', '-f', choices=json_output_formats, default='pretty',
+                      help='pretty: indented JSON list, compact: JSON list without whitespace, jsonl: one protein per line')
+    parser.add_argument('--incremental', action='store_true',
+                      help=f'Only reparse kinases whose inputs changed, using {manifest_file_path} and {clinvar_cache_dir}')
+    parser.add_argument('--merge-duplicates', action='store_true',
+                      help='Write one record per (full_sequence_pos, from, to) with the databases that reported it in "sources"')
+    parser.add_argument('--profile-report', type=str, default=None,
+                      help='Append the per-stage timings, peak RSS and counters of this run as a JSON line to this file')
+    parser.add_argument('--cprofile', type=str, default=None,
+                      help='Run cProfile during the stages and save the stats to this file (read with python -m pstats)')
+    args = parser.parse_args()
+
+    fasta_file_path = args.alignment
     subs_file_path_omim = './kinsnps/subkinsnps_uid_subs_split.txt'
-    output_file_path = './data/kinsnps_allinfo_twodbs.json'
+    output_file_path = args.output
+    if output_file_path is None:
+        output_file_path = './data/kinsnps_allinfo_twodbs.jsonl' if args.format == 'jsonl' else './data/kinsnps_allinfo_twodbs.json'
 
-    uniprot_info = parse_fasta_file(fasta_file_path)
-    uniprot_info = parse_subs_file(subs_file_path_omim, uniprot_info)
-    uniprot_info = add_clinvar_substitutions(uniprot_info)  # Add this line
-    
-    with open(output_file_path, 'w') as json_file:
-        json.dump(list(uniprot_info.values()), json_file, indent=4)
+    fingerprints = None
+    if args.incremental:
+        manifest = load_manifest(manifest_file_path)
+        clinvar_paths = [clinvar_file_path for _, _, clinvar_file_path in get_clinvar_jobs(manifest.get("kinases", {}))]
+        input_paths = [fasta_file_path, subs_file_path_omim, omim_found_file_path, omim_notfound_file_path] + clinvar_paths
+        fingerprints = get_input_fingerprints(input_paths, manifest.get("inputs"))
+        output_fingerprint = file_fingerprint(output_file_path, manifest.get("output"))
+        # --parquet and the profiling options ask for outputs beyond the JSON file, so they always run
+        extra_outputs = args.parquet or args.profile_report or args.cprofile
+        if not extra_outputs and manifest.get("inputs") == fingerprints and output_fingerprint is not None \
+                and output_fingerprint == manifest.get("output") and manifest.get("format") == args.format \
+                and manifest.get("merge_duplicates", False) == args.merge_duplicates:
+            print(f"{output_file_path} is up to date")
+            sys.exit(0)
+
+    profile = RunProfile(args.cprofile)
+    with profile.stage('fasta') as counters:
+        uniprot_info = parse_fasta_file(fasta_file_path, vectorized=args.numpy)
+        counters["proteins"] = len(uniprot_info)
+    with profile.stage('omim') as counters:
+        uniprot_info = parse_subs_file(subs_file_path_omim, uniprot_info, counters)
+    with profile.stage('clinvar') as counters:
+        uniprot_info = add_clinvar_substitutions(uniprot_info, workers=args.workers,
+                                                 cache_dir=clinvar_cache_dir if args.incremental else None,
+                                                 fingerprints=fingerprints, counters=counters)
+    if args.merge_duplicates:
+        with profile.stage('merge') as counters:
+            counters["merged"] = merge_duplicate_substitutions(uniprot_info)
+        print(f"Merged {counters['merged']} duplicate substitutions")
+
+    with profile.stage('write') as counters:
+        output_size, output_time = write_json_output(uniprot_info.values(), output_file_path, args.format)
+        counters.update(proteins=len(uniprot_info), output_bytes=output_size,
+                        substitutions=sum(len(protein["substitutions"]) for protein in uniprot_info.values()))
+    print(f"Wrote {output_size / 1e6:.1f} MB to {output_file_path} in {output_time:.2f} s")
+
+    if args.parquet:
+        from columnar_export import write_columnar
+        with profile.stage('parquet'):
+            write_columnar(list(uniprot_info.values()), args.parquet)
+
+    print(profile.format())
+    profile.save(args.profile_report)
+
+    if args.incremental:
+        clinvar_paths = [clinvar_file_path for _, _, clinvar_file_path in get_clinvar_jobs(uniprot_info)]
+        input_paths = [fasta_file_path, subs_file_path_omim, omim_found_file_path, omim_notfound_file_path] + clinvar_paths
+        save_manifest({
+            "inputs": get_input_fingerprints(input_paths, fingerprints),
+            "kinases": sorted(uniprot_info),
+            "format": args.format,
+            "merge_duplicates": args.merge_duplicates,
+            "output": file_fingerprint(output_file_path)
+        }, manifest_file_path)
 
     print("Done!")
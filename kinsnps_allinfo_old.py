@@ -1,8 +1,20 @@
 import json
+from alignment_cache import load_alignment_cache, save_alignment_cache
 
 n = 4  # Number of characters before and after the alignment position for the matched property
 
-def parse_fasta_file(fasta_file_path):
+def parse_fasta_file(fasta_file_path, use_cache=True):
+    if use_cache:
+        cached = load_alignment_cache(fasta_file_path, 'old')
+        if cached is not None:
+            return cached
+
+    uniprot_info = parse_fasta_text(fasta_file_path)
+    if use_cache:
+        save_alignment_cache(fasta_file_path, uniprot_info, 'old')
+    return uniprot_info
+
+def parse_fasta_text(fasta_file_path):
     uniprot_info = {}
     with open(fasta_file_path, 'r') as file:
         current_id = None
@@ -15,7 +27,7 @@ def parse_fasta_file(fasta_file_path):
                     sequence = next(file).strip()
                     sequence = sequence[sequence.index("{")+1:sequence.index("}")]
                     flanking_positions = []
-                    kinase_domain = ""
+                    kinase_domain = []
                     kinase_start = -1
                     kinase_end = -1
                     pos = 1
@@ -39,10 +51,11 @@ def parse_fasta_file(fasta_file_path):
                             else:
                                 if kinase_start == -1:
                                     kinase_start = pos
-                                kinase_domain += char
+                                kinase_domain.append(char)
                                 pos += 1
                     if kinase_end == -1:  # If no flanking regions or at the end
                         kinase_end = pos - 1
+                    kinase_domain = ''.join(kinase_domain)
 
                     # Create kinase_domain_alignment sequence
                     kinase_domain_alignment = ''.join(c for c in kinase_domain if c.isupper() or c == '-')
@@ -1,5 +1,8 @@
 import os
 import csv
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, NamedTuple
 
 # Define the paths
 allelic_variants_dir = './data/allelic_variants/'
@@ -10,63 +13,109 @@ output_file_path = './data/merged_allelic_variants.tsv'
 # Define the output file headers
 headers = ['OMIM_ID', 'Kinase_Description', 'Uniprot_ID', 'Gene', 'Number', 'Phenotype', 'Mutation', 'SNP', 'gnomAD_SNP', 'ClinVar']
 
-# Read the OMIM IDs and gene information
-omim_id_to_gene = {}
-with open(omim_ids_csv_path, 'r') as csvfile:
-    reader = csv.DictReader(csvfile)
-    for row in reader:
-        omim_id_to_gene[row['mimNumber']] = row['gene']
+class AllelicVariant(NamedTuple):
+    """One row of the merged file, in output column order."""
+    omim_id: str
+    kinase_description: str
+    uniprot_id: str
+    gene: str
+    number: str
+    phenotype: str
+    mutation: str
+    snp: str
+    gnomad_snp: str
+    clinvar: str
 
-# Read the kinase list and uniprot ID information
+omim_id_to_gene = {}
 gene_to_uniprot_id = {}
-with open(kinase_list_csv_path, 'r') as csvfile:
-    reader = csv.DictReader(csvfile)
-    for row in reader:
-        gene_to_uniprot_id[row['gene']] = row['uniprot_id']
+
+def load_mappings(omim_ids_path: str = omim_ids_csv_path, kinase_list_path: str = kinase_list_csv_path) -> tuple:
+    """Read the OMIM ID -> gene and gene -> Uniprot ID mappings."""
+    omim_map = {}
+    with open(omim_ids_path, 'r') as csvfile:
+        reader = csv.DictReader(csvfile)
+        for row in reader:
+            omim_map[row['mimNumber']] = row['gene']
+
+    gene_map = {}
+    with open(kinase_list_path, 'r') as csvfile:
+        reader = csv.DictReader(csvfile)
+        for row in reader:
+            gene_map[row['gene']] = row['uniprot_id']
+    return omim_map, gene_map
+
+def init_worker(omim_map: Dict[str, str], gene_map: Dict[str, str]) -> None:
+    """Install the mappings once per process instead of pickling them with every file."""
+    omim_id_to_gene.update(omim_map)
+    gene_to_uniprot_id.update(gene_map)
 
 # Function to parse a single TSV file
-def parse_tsv_file(tsv_path):
+def parse_tsv_file(tsv_path: str) -> List[AllelicVariant]:
+    """Parse the allelic variants table of one OMIM export in a single pass over its lines."""
+    omim_id = None
+    kinase_desc = ""
+    previous_line = ""
+    line_count = 0
+    skip = None  # Lines left before the variant rows, None until the section header is seen
+    raw_variants = []
     with open(tsv_path, 'r') as file:
-        lines = file.readlines()
-        if len(lines) < 6:
-            return []  # Invalid file format
-
-        omim_id = lines[0].split("-")[1].strip()
-        
-        # Find the kinase_description
-        kinase_desc = ""
-        for i, line in enumerate(lines):
-            if line.startswith("Allelic Variants ("):
-                kinase_desc = lines[i-1].strip()
-                break
-        
-        gene = omim_id_to_gene.get(omim_id, "Unknown")
-        uniprot_id = gene_to_uniprot_id.get(gene, "Unknown")
-        
-        variants = []
-        
-        # Read the allelic variants section
-        variant_lines = lines[i+3:]  # Allelic variants section starts 3 lines after "Allelic Variants ("
-        for line in variant_lines:
-            if line.strip():
+        for line in file:
+            line_count += 1
+            if omim_id is None:
+                omim_id = line.split("-")[1].strip()
+            if skip is None:
+                if line.startswith("Allelic Variants ("):
+                    # The kinase description is the line right above the section header
+                    kinase_desc = previous_line.strip()
+                    skip = 2  # Allelic variants section starts 3 lines after "Allelic Variants ("
+                previous_line = line
+            elif skip:
+                skip -= 1
+            elif line.strip():
                 parts = line.strip().split('\t')
                 if len(parts) == 6:
-                    number, phenotype, mutation, snp, gnomad_snp, clinvar = parts
-                    variants.append([omim_id, kinase_desc, uniprot_id, gene, number, phenotype, mutation, snp, gnomad_snp, clinvar])
-        
-        return variants
+                    raw_variants.append(parts)
+
+    if line_count < 6:
+        return []  # Invalid file format
+
+    gene = omim_id_to_gene.get(omim_id, "Unknown")
+    uniprot_id = gene_to_uniprot_id.get(gene, "Unknown")
+    return [AllelicVariant(omim_id, kinase_desc, uniprot_id, gene, *parts) for parts in raw_variants]
+
+def iter_variants(tsv_paths: List[str], workers: int = 1) -> Iterator[AllelicVariant]:
+    """Yield the variants of each file in the order of tsv_paths, parsing files in a process pool."""
+    if workers <= 1:
+        for tsv_path in tsv_paths:
+            yield from parse_tsv_file(tsv_path)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(omim_id_to_gene, gene_to_uniprot_id)) as executor:
+        # map keeps submission order, so the output does not depend on which worker finishes first
+        for variants in executor.map(parse_tsv_file, tsv_paths, chunksize=8):
+            yield from variants
 
-# Collect all variants from all files
-all_variants = []
-for filename in os.listdir(allelic_variants_dir):
-    if filename.endswith('.tsv'):
-        tsv_path = os.path.join(allelic_variants_dir, filename)
-        all_variants.extend(parse_tsv_file(tsv_path))
+def merge_tsvs(input_dir: str = allelic_variants_dir, output_path: str = output_file_path, workers: int = 1) -> int:
+    """Stream every *.tsv file in input_dir, in file name order, into one merged TSV; returns the row count."""
+    tsv_paths = [os.path.join(input_dir, filename) for filename in sorted(os.listdir(input_dir))
+                 if filename.endswith('.tsv')]
+    rows = 0
+    with open(output_path, 'w', newline='') as output_file:
+        writer = csv.writer(output_file, delimiter='\t')
+        writer.writerow(headers)
+        for variant in iter_variants(tsv_paths, workers):
+            writer.writerow(variant)
+            rows += 1
+    return rows
 
-# Write the merged data to the output TSV file
-with open(output_file_path, 'w', newline='') as output_file:
-    writer = csv.writer(output_file, delimiter='\t')
-    writer.writerow(headers)
-    writer.writerows(all_variants)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge the OMIM allelic variants TSV files")
+    parser.add_argument('--workers', '-w', type=int, default=1,
+                      help='Number of processes parsing TSV files (default: 1)')
+    args = parser.parse_args()
 
-print(f"Merged TSV file created at: {output_file_path}")
\ No newline at end of file
+    omim_map, gene_map = load_mappings()
+    init_worker(omim_map, gene_map)
+    rows = merge_tsvs(workers=args.workers)
+    print(f"Merged {rows} variants")
+    print(f"Merged TSV file created at: {output_file_path}")
@@ -0,0 +1,118 @@
+import os
+import csv
+import re
+import argparse
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, TextIO
+
+merged_variants_path = './data/merged_allelic_variants.tsv'
+omim_uniprot_mapping_path = './data/omim_uniprot_mapping.csv'
+subs_file_path = './kinsnps/subkinsnps_uid_subs_split.txt'
+unparsed_file_path = './data/unparsed_mutations.tsv'
+
+subs_header = ['Uniprot ID', 'WT Amino Acid', 'Position', 'Mutant Amino Acid']
+
+three_letter_codes = {
+    'ALA': 'A', 'ARG': 'R', 'ASN': 'N', 'ASP': 'D', 'CYS': 'C', 'GLN': 'Q', 'GLU': 'E', 'GLY': 'G', 'HIS': 'H', 'ILE': 'I',
+    'LEU': 'L', 'LYS': 'K', 'MET': 'M', 'PHE': 'F', 'PRO': 'P', 'SER': 'S', 'THR': 'T', 'TRP': 'W', 'TYR': 'Y', 'VAL': 'V',
+    'TER': '*'
+}
+
+# OMIM writes protein substitutions as e.g. "ARG206HIS" after the gene symbol ("ACVR1, ARG206HIS")
+substitution_pattern = re.compile(r'\b(%s)(\d+)(%s)\b' % ('|'.join(three_letter_codes), '|'.join(three_letter_codes)))
+# Anything shaped like a substitution, to report typos such as "LU1159ARG"; splice sites (IVS4AS),
+# exon deletions (EX16DEL), frameshifts (FS647TER) and in-frame deletions (ASP273DEL) are not substitutions
+candidate_pattern = re.compile(r'\b(?!IVS|EX\d|FS\d)[A-Z]{2,3}\d+(?!DEL\b|DUP\b|INS)[A-Z]{2,3}\b')
+
+class Substitution(NamedTuple):
+    uniprot_id: str
+    from_aa: str
+    pos: int
+    to_aa: str
+
+def parse_mutation(mutation: str) -> tuple:
+    """Split an OMIM mutation string into its substitutions and the substitution-like tokens that did not parse."""
+    mutation = mutation.split(', ', 1)[-1]  # Drop the leading gene symbol, e.g. "PI4KA"
+    substitutions = []
+    for match in substitution_pattern.finditer(mutation):
+        from_code, pos, to_code = match.groups()
+        substitutions.append((three_letter_codes[from_code], int(pos), three_letter_codes[to_code]))
+    unparsed = [token for token in candidate_pattern.findall(mutation) if not substitution_pattern.fullmatch(token)]
+    return substitutions, unparsed
+
+def load_omim_uniprot_mapping(path: str = omim_uniprot_mapping_path) -> Dict[str, str]:
+    """Read the OMIM ID -> Uniprot ID mapping written by extract_uniprotids_from_omim.py."""
+    mapping = {}
+    if os.path.exists(path):
+        with open(path, 'r') as csvfile:
+            for row in csv.DictReader(csvfile):
+                mapping[row['omim_id']] = row['uniprot_id']
+    return mapping
+
+def iter_substitutions(merged_path: str, mapping: Dict[str, str],
+                       on_unparsed: Optional[Callable[[List[str]], None]] = None) -> Iterator[Substitution]:
+    """Stream unique substitutions from the merged allelic variants file in file order.
+
+    Variants without a usable substitution are passed to on_unparsed as [OMIM_ID, Number, Mutation, Reason].
+    """
+    seen = set()
+    with open(merged_path, 'r', newline='') as file:
+        for row in csv.DictReader(file, delimiter='\t'):
+            mutation = row['Mutation']
+            substitutions, unparsed = parse_mutation(mutation)
+            # The scraped mapping is preferred over the kinase list lookup done by merge_tsvs.py
+            uniprot_id = mapping.get(row['OMIM_ID']) or row['Uniprot_ID']
+            if uniprot_id == 'Unknown' and substitutions:
+                unparsed, substitutions = [f"{from_aa}{pos}{to_aa}" for from_aa, pos, to_aa in substitutions], []
+                reason = 'no Uniprot ID'
+            else:
+                reason = 'unrecognized substitution' if unparsed else 'no substitution'
+            if on_unparsed is not None and (unparsed or not substitutions):
+                on_unparsed([row['OMIM_ID'], row['Number'], mutation, reason])
+
+            for from_aa, pos, to_aa in substitutions:
+                substitution = Substitution(uniprot_id, from_aa, pos, to_aa)
+                if substitution not in seen:
+                    seen.add(substitution)
+                    yield substitution
+
+def write_subs_file(substitutions: Iterator[Substitution], output: TextIO) -> int:
+    """Write substitutions in the layout parse_subs_file reads; returns the row count."""
+    output.write('\t'.join(subs_header) + '\n')
+    rows = 0
+    for substitution in substitutions:
+        output.write(f"{substitution.uniprot_id}\t{substitution.from_aa}\t{substitution.pos}\t{substitution.to_aa}\n")
+        rows += 1
+    return rows
+
+def convert(merged_path: str = merged_variants_path, output_path: str = subs_file_path,
+            unparsed_path: str = unparsed_file_path, mapping_path: str = omim_uniprot_mapping_path) -> tuple:
+    """Convert the merged OMIM variants into the substitutions file; returns (rows written, variants reported)."""
+    mapping = load_omim_uniprot_mapping(mapping_path)
+    reported = 0
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, 'w') as output, open(unparsed_path, 'w', newline='') as unparsed_file:
+        unparsed_writer = csv.writer(unparsed_file, delimiter='\t')
+        unparsed_writer.writerow(['OMIM_ID', 'Number', 'Mutation', 'Reason'])
+
+        def report(row):
+            nonlocal reported
+            unparsed_writer.writerow(row)
+            reported += 1
+
+        rows = write_subs_file(iter_substitutions(merged_path, mapping, report), output)
+    os.replace(tmp_path, output_path)
+    return rows, reported
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert OMIM mutation strings to the substitutions file")
+    parser.add_argument('--input', '-i', type=str, default=merged_variants_path,
+                      help=f'Merged allelic variants TSV (default: {merged_variants_path})')
+    parser.add_argument('--output', '-o', type=str, default=subs_file_path,
+                      help=f'Substitutions file read by kinsnps_allinfo.py (default: {subs_file_path})')
+    parser.add_argument('--unparsed', type=str, default=unparsed_file_path,
+                      help=f'Report of variants without a usable substitution (default: {unparsed_file_path})')
+    args = parser.parse_args()
+
+    rows, reported = convert(args.input, args.output, args.unparsed)
+    print(f"Wrote {rows} substitutions to {args.output}")
+    print(f"Reported {reported} variants without a usable substitution in {args.unparsed}")
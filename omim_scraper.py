@@ -0,0 +1,99 @@
+import codecs
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, Iterator, Optional
+from urllib.parse import urlsplit
+
+import requests
+from bs4 import BeautifulSoup
+
+from http_cache import default_cache
+
+omim_entry_url = 'https://omim.org/entry/{}'
+
+# First <a> whose href points at a UniProtKB entry, the same link BeautifulSoup would find
+uniprot_href_pattern = re.compile(
+    r'''<a\b[^>]*?\bhref\s*=\s*["']([^"']*uniprot\.org/uniprotkb/[^"']*)["']''', re.IGNORECASE)
+stream_overlap = 512  # Characters kept between chunks so a link split across them still matches
+
+def extract_uniprot_id(html: str) -> Optional[str]:
+    """Find the UniProt ID in an OMIM entry page with a regex, falling back to BeautifulSoup."""
+    match = uniprot_href_pattern.search(html)
+    if match:
+        return match.group(1).split('/')[-1]
+    soup = BeautifulSoup(html, 'html.parser')
+    uniprot_link = soup.find('a', href=lambda href: href and 'uniprot.org/uniprotkb/' in href)
+    return uniprot_link['href'].split('/')[-1] if uniprot_link else None
+
+def fetch_uniprot_id(mim_number: str, headers: Dict, session=None, check_cache: bool = True) -> tuple:
+    """Stream an OMIM entry page until the UniProt link shows up; returns (uniprot_id, from_cache)."""
+    url = omim_entry_url.format(mim_number)
+    if check_cache:
+        cached = default_cache.lookup(url)
+        if cached is not None:
+            return extract_uniprot_id(cached.text), True
+
+    session = session or requests
+    with session.get(url, headers=headers, stream=True) as response:
+        response.raise_for_status()
+        body = bytearray()
+        window = ''
+        decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+        for chunk in response.iter_content(chunk_size=16384):
+            body.extend(chunk)
+            window = window[-stream_overlap:] + decoder.decode(chunk)
+            match = uniprot_href_pattern.search(window)
+            if match:
+                # Stop reading; a partial page is not cached, reruns skip it through the callers' resume logs
+                return match.group(1).split('/')[-1], False
+
+        # No fast match: the whole page was read, so cache it and let BeautifulSoup have a go
+        encoding = response.encoding or response.apparent_encoding
+        default_cache.store(url, None, response.status_code, response.headers, bytes(body), encoding)
+        return extract_uniprot_id(bytes(body).decode(encoding or 'utf-8', errors='replace')), False
+
+class HostThrottle:
+    """Per-host politeness: request starts to the same host are at least `delay` (+ jitter) seconds apart."""
+
+    def __init__(self, delay: float = 1.0, jitter: float = 1.0):
+        self.delay = delay
+        self.jitter = jitter
+        self.next_allowed = {}
+        self.lock = threading.Lock()
+
+    def wait(self, url: str) -> None:
+        host = urlsplit(url).netloc
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_allowed.get(host, now))
+            self.next_allowed[host] = start + self.delay + random.uniform(0, self.jitter)
+        if start > now:
+            time.sleep(start - now)
+
+def scrape_uniprot_ids(mim_numbers: Iterable[str], headers_factory: Callable[[], Dict], workers: int = 4,
+                       delay: float = 1.0, jitter: float = 1.0) -> Iterator[tuple]:
+    """Fetch UniProt IDs in a bounded thread pool; yields (mim_number, uniprot_id, error) as they complete."""
+    throttle = HostThrottle(delay, jitter)
+    local = threading.local()
+
+    def work(mim_number):
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        url = omim_entry_url.format(mim_number)
+        cached = default_cache.lookup(url)
+        if cached is not None:
+            return extract_uniprot_id(cached.text)  # Cache hits never touch the host
+        throttle.wait(url)
+        return fetch_uniprot_id(mim_number, headers_factory(), local.session, check_cache=False)[0]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(work, mim_number): mim_number for mim_number in mim_numbers}
+        for future in as_completed(futures):
+            mim_number = futures[future]
+            try:
+                yield mim_number, future.result(), None
+            except requests.RequestException as e:
+                yield mim_number, None, e
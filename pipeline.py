@@ -0,0 +1,247 @@
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, List, NamedTuple, Optional
+
+from alignment_cache import file_fingerprint, load_manifest, save_manifest
+
+repo_dir = os.path.dirname(os.path.abspath(__file__))
+state_file_path = './data/pipeline_state.json'
+
+class Stage(NamedTuple):
+    name: str
+    command: List[str]  # Script and arguments, run with the current interpreter from the repository root
+    inputs: List[str]  # Files or directories the stage reads
+    outputs: List[str]  # Files or directories the stage writes
+
+# The workflow of the README; a stage depends on the stages that produce its inputs
+stages = [
+    Stage('omim_ids', ['get_omim_ids.py'],
+          ['data/kinase_list.csv'], ['data/omim_ids.csv']),
+    Stage('allelic_variants', ['save_allelic_variants_tsv_files.py'],
+          ['data/omim_ids.csv'], ['data/allelic_variants']),
+    Stage('stats', ['stats.py'],
+          ['data/omim_ids.csv', 'data/allelic_variants'], ['data/omim_ids_found.csv', 'data/omim_ids_notfound.csv']),
+    Stage('uniprot_ids', ['get_uniprot_ids.py'],
+          ['data/omim_ids_notfound.csv'], ['data/omim_ids_notfound_with_uniprot.csv']),
+    Stage('omim_uniprot_mapping', ['extract_uniprotids_from_omim.py'],
+          ['data/omim_ids.csv'], ['data/omim_uniprot_mapping.csv']),
+    Stage('clinvar', ['get_clinvar_eutils.py'],
+          ['data/omim_ids.csv'], ['data/clinvar']),
+    Stage('merge', ['merge_tsvs.py'],
+          ['data/allelic_variants', 'data/omim_ids.csv', 'data/kinase_list.csv'], ['data/merged_allelic_variants.tsv']),
+    Stage('omim_subs', ['omim_mutations.py'],
+          ['data/merged_allelic_variants.tsv', 'data/omim_uniprot_mapping.csv'], ['kinsnps/subkinsnps_uid_subs_split.txt']),
+    Stage('allinfo', ['kinsnps_allinfo.py', '--alignment', 'kinsnps/human_kinases.mma'],
+          ['kinsnps/human_kinases.mma', 'kinsnps/subkinsnps_uid_subs_split.txt', 'data/clinvar',
+           'data/omim_ids_found_with_uniprot.csv', 'data/omim_ids_notfound_with_uniprot.csv'],
+          ['data/kinsnps_allinfo_twodbs.json']),
+    Stage('validate', ['validate_subkinsnps_allinfo.py', '--input', 'data/kinsnps_allinfo_twodbs.json'],
+          ['data/kinsnps_allinfo_twodbs.json'], ['data/validation_errors.jsonl']),
+]
+
+def list_files(path: str) -> List[str]:
+    """Return path itself for a file, or every file below it for a directory (sorted, hidden files excluded)."""
+    if not os.path.isdir(path):
+        return [path] if os.path.exists(path) else []
+    files = []
+    for root, dirs, names in os.walk(path):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+        files.extend(os.path.join(root, name) for name in sorted(names) if not name.startswith('.'))
+    return files
+
+def newest_mtime(path: str) -> Optional[float]:
+    mtimes = [os.path.getmtime(file_path) for file_path in list_files(path)]
+    return max(mtimes) if mtimes else None
+
+def total_size(paths: List[str]) -> int:
+    return sum(os.path.getsize(file_path) for path in paths for file_path in list_files(path))
+
+def path_fingerprints(paths: List[str], previous: Optional[Dict] = None) -> Dict:
+    """Fingerprint every file below paths, reusing unchanged hashes from a previous state."""
+    previous = previous or {}
+    fingerprints = {}
+    for path in paths:
+        for file_path in list_files(path):
+            fingerprints[file_path] = file_fingerprint(file_path, previous.get(file_path))
+    return fingerprints
+
+def same_content(current: Dict, recorded: Dict) -> bool:
+    return current.keys() == recorded.keys() and all(
+        current[path]["sha256"] == recorded[path]["sha256"] for path in current)
+
+def missing_inputs(stage: Stage) -> List[str]:
+    return [path for path in stage.inputs if not list_files(path)]
+
+def is_up_to_date(stage: Stage, mode: str, state: Dict) -> bool:
+    """mtime: the last successful run, or every output, is newer than every input.
+    hash: inputs and outputs match the last successful run."""
+    if any(not list_files(path) for path in stage.outputs):
+        return False
+    recorded = state.get(stage.name) or {}
+    if mode == 'mtime':
+        input_mtimes = [newest_mtime(path) for path in stage.inputs]
+        if any(mtime is None for mtime in input_mtimes):
+            return False
+        # Resumable stages leave their outputs untouched when there is nothing new to fetch,
+        # so the time of their last successful run counts as well
+        finished = max(recorded.get("finished", 0), min(newest_mtime(path) for path in stage.outputs))
+        return finished >= max(input_mtimes, default=0)
+
+    if "inputs" not in recorded:
+        return False
+    return (same_content(path_fingerprints(stage.inputs, recorded["inputs"]), recorded["inputs"])
+            and same_content(path_fingerprints(stage.outputs, recorded["outputs"]), recorded["outputs"]))
+
+def run_stage(stage: Stage) -> Dict:
+    """Run one stage as a child process; returns its exit code, wall time and resource usage.
+
+    Without os.wait4 (Windows) the disk and RSS figures are None.
+    """
+    start_time = time.perf_counter()
+    process = subprocess.Popen([sys.executable, *stage.command], cwd=repo_dir)
+    if not hasattr(os, 'wait4'):
+        return {
+            "returncode": process.wait(),
+            "seconds": time.perf_counter() - start_time,
+            "block_read_bytes": None,
+            "block_write_bytes": None,
+            "max_rss_kb": None
+        }
+    # wait4 gives the rusage of this child alone, even while other stages run concurrently
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return {
+        "returncode": process.returncode,
+        "seconds": time.perf_counter() - start_time,
+        "block_read_bytes": usage.ru_inblock * 512,
+        "block_write_bytes": usage.ru_oublock * 512,
+        "max_rss_kb": usage.ru_maxrss
+    }
+
+def stage_dependencies(selected: List[Stage]) -> Dict[str, set]:
+    producers = {output: stage.name for stage in selected for output in stage.outputs}
+    return {stage.name: {producers[path] for path in stage.inputs if path in producers} for stage in selected}
+
+def select_stages(targets: Optional[List[str]], all_stages: List[Stage] = stages) -> List[Stage]:
+    """Return the target stages and everything upstream of them, in declaration order."""
+    if not targets:
+        return list(all_stages)
+    by_name = {stage.name: stage for stage in all_stages}
+    dependencies = stage_dependencies(all_stages)
+    selected, pending = set(), list(targets)
+    while pending:
+        name = pending.pop()
+        if name not in by_name:
+            raise ValueError(f"Unknown stage: {name}")
+        if name not in selected:
+            selected.add(name)
+            pending.extend(dependencies[name])
+    return [stage for stage in all_stages if stage.name in selected]
+
+def run_pipeline(selected: List[Stage], mode: str = 'mtime', jobs: int = 2, force: tuple = (),
+                 dry_run: bool = False, state_path: str = state_file_path) -> Dict[str, Dict]:
+    """Run stages whose dependencies are done, up to `jobs` at a time; returns a report entry per stage."""
+    root_state_path = os.path.join(repo_dir, state_path)
+    state = load_manifest(root_state_path)
+    dependencies = stage_dependencies(selected)
+    by_name = {stage.name: stage for stage in selected}
+    report = {}
+    running = {}
+
+    producers = {output for stage in selected for output in stage.outputs}
+
+    def start(stage):
+        # In a dry run the outputs of upstream stages that would run do not exist yet
+        missing = [path for path in missing_inputs(stage) if not (dry_run and path in producers)]
+        if missing:
+            print(f"Blocked {stage.name}: missing input {', '.join(missing)}")
+            report[stage.name] = {"status": "blocked", "missing_inputs": missing}
+            return
+        if stage.name not in force and is_up_to_date(stage, mode, state):
+            report[stage.name] = {"status": "up to date"}
+            return
+        if dry_run:
+            report[stage.name] = {"status": "would run"}
+            return
+        print(f"Running {stage.name}: {' '.join(stage.command)}")
+        report[stage.name] = {"status": "running", "input_bytes": total_size(stage.inputs)}
+        running[executor.submit(run_stage, stage)] = stage
+
+    os.chdir(repo_dir)  # Stage paths are relative to the repository root
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        while True:
+            for stage in selected:
+                if stage.name in report:
+                    continue
+                upstream = [report.get(name, {}).get("status") for name in dependencies[stage.name]]
+                if any(status in ("failed", "blocked") for status in upstream):
+                    report[stage.name] = {"status": "blocked"}
+                elif all(status in ("up to date", "ran", "would run") for status in upstream):
+                    start(stage)
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                result = future.result()
+                entry = report[stage.name]
+                entry.update(result, status="ran" if result["returncode"] == 0 else "failed",
+                             output_bytes=total_size(stage.outputs))
+                print(f"Finished {stage.name} in {result['seconds']:.1f}s ({entry['status']})")
+                if entry["status"] == "ran":
+                    recorded = state.get(stage.name, {})
+                    state[stage.name] = {"finished": time.time()}
+                    if mode == 'hash':
+                        state[stage.name].update(inputs=path_fingerprints(stage.inputs, recorded.get("inputs")),
+                                                 outputs=path_fingerprints(stage.outputs, recorded.get("outputs")))
+                    save_manifest(state, root_state_path)
+    return {stage.name: report[stage.name] for stage in by_name.values()}
+
+def format_bytes(size: Optional[int]) -> str:
+    return '-' if size is None else f"{size / 1e6:.1f} MB"
+
+def format_report(report: Dict[str, Dict]) -> str:
+    lines = [f"{'stage':<22}{'status':<12}{'wall':>9}{'in files':>12}{'out files':>12}{'disk read':>12}{'disk write':>12}"]
+    for name, entry in report.items():
+        seconds = f"{entry['seconds']:.1f}s" if 'seconds' in entry else '-'
+        lines.append(f"{name:<22}{entry['status']:<12}{seconds:>9}"
+                     f"{format_bytes(entry.get('input_bytes')):>12}{format_bytes(entry.get('output_bytes')):>12}"
+                     f"{format_bytes(entry.get('block_read_bytes')):>12}{format_bytes(entry.get('block_write_bytes')):>12}")
+    return '\n'.join(lines)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the workflow stages that are out of date")
+    parser.add_argument('targets', nargs='*',
+                      help='Stages to bring up to date, with everything upstream of them (default: all)')
+    parser.add_argument('--mode', choices=['mtime', 'hash'], default='mtime',
+                      help='mtime: outputs newer than inputs are up to date; hash: content matches the last run')
+    parser.add_argument('--jobs', '-j', type=int, default=2,
+                      help='Maximum number of independent stages run at the same time (default: 2)')
+    parser.add_argument('--force', '-f', action='append', default=[],
+                      help='Stage to run even if it is up to date; repeat for several stages')
+    parser.add_argument('--dry-run', '-n', action='store_true',
+                      help='Only report which stages would run')
+    parser.add_argument('--list', action='store_true',
+                      help='List the stages with their inputs and outputs')
+    parser.add_argument('--report', type=str, default=None,
+                      help='Also write the per-stage report as JSON')
+    args = parser.parse_args()
+
+    if args.list:
+        for stage in stages:
+            print(f"{stage.name}: {' '.join(stage.command)}\n  in:  {', '.join(stage.inputs)}\n  out: {', '.join(stage.outputs)}")
+        sys.exit(0)
+
+    start_time = time.perf_counter()
+    report = run_pipeline(select_stages(args.targets), args.mode, args.jobs, tuple(args.force), args.dry_run)
+    print(format_report(report))
+    print(f"Total time: {time.perf_counter() - start_time:.1f}s")
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=4)
+    sys.exit(1 if any(entry["status"] in ("failed", "blocked") for entry in report.values()) else 0)
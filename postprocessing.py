@@ -1,98 +1,224 @@
 import json
 import os
+import time
 import argparse
-from typing import Dict, List
+from typing import Dict, Iterable, Iterator, List, Optional
 
-def load_json_file(file_path: str) -> List[Dict]:
-    """Load data from JSON file."""
-    try:
-        with open(file_path, 'r') as file:
-            return json.load(file)
-    except FileNotFoundError:
-        print(f"Error: Could not find file {file_path}")
-        return []
-    except json.JSONDecodeError:
-        print(f"Error: Invalid JSON in file {file_path}")
-        return []
-
-def save_json_file(data: List[Dict], file_path: str) -> None:
-    """Save data to JSON file."""
-    try:
-        with open(file_path, 'w') as file:
-            json.dump(data, file, indent=4)
-        print(f"Successfully saved data to {file_path}")
-    except Exception as e:
-        print(f"Error saving data to {file_path}: {e}")
+from kinsnps_allinfo import iter_proteins, json_output_formats, merge_substitutions, substitution_sources, write_json_output
+from validate_subkinsnps_allinfo import residue_code
+
+def sequence_length(sequence: str) -> int:
+    """Number of residues in an alignment row, ignoring parentheses, spaces and dashes."""
+    return len(sequence) - sum(sequence.count(c) for c in '() -')
+
+class SubstitutionFilter:
+    """One step of the post-processing chain; keep() decides per substitution, counters are kept per step."""
+
+    name = 'filter'
+
+    def __init__(self):
+        self.substitutions_in = 0
+        self.removed = 0
+        self.seconds = 0.0
+
+    def prepare(self, protein: Dict) -> None:
+        """Compute per-protein state once before keep() is called for its substitutions."""
+
+    def keep(self, protein: Dict, sub: Dict) -> bool:
+        return True
+
+    def select(self, protein: Dict, substitutions: List[Dict]) -> List[Dict]:
+        """Return the substitutions that remain after this step."""
+        self.prepare(protein)
+        return [sub for sub in substitutions if self.keep(protein, sub)]
+
+    def __call__(self, protein: Dict) -> Dict:
+        start_time = time.perf_counter()
+        substitutions = protein.get("substitutions", [])
+        kept = self.select(protein, substitutions)
+        self.substitutions_in += len(substitutions)
+        self.removed += len(substitutions) - len(kept)
+        protein["substitutions"] = kept
+        self.seconds += time.perf_counter() - start_time
+        return protein
+
+    def report(self) -> str:
+        return (f"{self.name:<10} {self.substitutions_in:>9} in {self.removed:>9} removed "
+                f"{self.seconds:>7.2f}s")
+
+class LengthFilter(SubstitutionFilter):
+    """Remove mutations where position exceeds sequence length."""
+
+    name = 'length'
+
+    def prepare(self, protein):
+        self.seq_length = sequence_length(protein.get("sequence", ""))
+
+    def keep(self, protein, sub):
+        return sub.get("full_sequence_pos", 0) <= self.seq_length
+
+class ResidueMismatchFilter(SubstitutionFilter):
+    """Remove substitutions whose 'from' residue is not the residue at full_sequence_pos.
+
+    'from' is normalized like the validator does, so one- and three-letter codes (L, Leu) are both accepted.
+    """
+
+    name = 'mismatch'
+    cleanup_table = str.maketrans('', '', '() -')
+
+    def prepare(self, protein):
+        self.residues = protein.get("sequence", "").translate(self.cleanup_table).upper()
+
+    def keep(self, protein, sub):
+        pos = sub.get("full_sequence_pos", 0)
+        return 1 <= pos <= len(self.residues) and self.residues[pos - 1] == residue_code(sub["from"])
+
+class DedupFilter(SubstitutionFilter):
+    """Keep the first of identical (full_sequence_pos, from, to) substitutions, e.g. OMIM and ClinVar reporting the same change."""
+
+    name = 'dedup'
+
+    def prepare(self, protein):
+        self.seen = set()
+
+    def keep(self, protein, sub):
+        key = (sub["full_sequence_pos"], sub["from"], sub["to"])
+        if key in self.seen:
+            return False
+        self.seen.add(key)
+        return True
+
+class MergeFilter(SubstitutionFilter):
+    """Merge identical (full_sequence_pos, from, to) substitutions into one record listing their sources."""
+
+    name = 'merge'
+
+    def select(self, protein, substitutions):
+        return merge_substitutions(substitutions)
+
+class DatabaseFilter(SubstitutionFilter):
+    """Keep only substitutions from the given databases; merged records are kept if any of their sources is."""
+
+    name = 'database'
+
+    def __init__(self, databases: Iterable[str]):
+        super().__init__()
+        self.databases = set(databases)
+
+    def keep(self, protein, sub):
+        return any(source["database"] in self.databases for source in substitution_sources(sub))
+
+filter_names = ('length', 'mismatch', 'dedup', 'merge', 'database')
+
+def build_filters(names: List[str], databases: Optional[List[str]] = None) -> List[SubstitutionFilter]:
+    """Instantiate the filters in the given order."""
+    filters = []
+    for name in names:
+        if name == 'length':
+            filters.append(LengthFilter())
+        elif name == 'mismatch':
+            filters.append(ResidueMismatchFilter())
+        elif name == 'dedup':
+            filters.append(DedupFilter())
+        elif name == 'merge':
+            filters.append(MergeFilter())
+        elif name == 'database':
+            if not databases:
+                raise ValueError("The database filter needs --databases")
+            filters.append(DatabaseFilter(databases))
+        else:
+            raise ValueError(f"Unknown filter {name}, expected one of {', '.join(filter_names)}")
+    return filters
+
+def apply_filters(proteins: Iterable[Dict], filters: List[SubstitutionFilter]) -> Iterator[Dict]:
+    """Run every protein through the chain in a single pass."""
+    for protein in proteins:
+        protein = protein.copy()  # Filters replace the substitutions list, never the caller's record
+        for substitution_filter in filters:
+            protein = substitution_filter(protein)
+        yield protein
 
 def cleanup_mutations(data: List[Dict]) -> List[Dict]:
     """Remove mutations where position exceeds sequence length."""
-    cleaned_data = []
-    removed_count = 0
-    
-    for protein in data:
-        sequence = protein.get("sequence", "")
-        seq_length = len([c for c in sequence if c not in '() -'])
-        
-        valid_substitutions = []
-        for sub in protein.get("substitutions", []):
-            pos = sub.get("full_sequence_pos", 0)
-            if pos <= seq_length:
-                valid_substitutions.append(sub)
-            else:
-                removed_count += 1
-                
-        # Create a new protein entry with valid substitutions only
-        cleaned_protein = protein.copy()
-        cleaned_protein["substitutions"] = valid_substitutions
-        cleaned_data.append(cleaned_protein)
-    
-    print(f"Removed {removed_count} mutations with positions exceeding sequence length")
+    length_filter = LengthFilter()
+    cleaned_data = list(apply_filters(data, [length_filter]))
+    print(f"Removed {length_filter.removed} mutations with positions exceeding sequence length")
     return cleaned_data
 
-def show_menu():
-    """Display the main menu options."""
-    print("\n=== Post-processing Menu ===")
-    print("1. Cleanup mutations (remove positions exceeding sequence length)")
-    print("0. Exit")
-    return input("Select an option: ")
+def postprocess(input_path: str, output_path: str, filters: List[SubstitutionFilter],
+                output_format: str = 'pretty') -> Dict:
+    """Stream the proteins of input_path through the filters into output_path; returns the run counters."""
+    start_time = time.perf_counter()
+    proteins = 0
+
+    def counted(records):
+        nonlocal proteins
+        for record in records:
+            proteins += 1
+            yield record
+
+    # The input is read lazily, so write next to the output and replace it at the end; -o may equal -i
+    tmp_path = f"{output_path}.tmp"
+    try:
+        size, _ = write_json_output(apply_filters(counted(iter_proteins(input_path)), filters), tmp_path, output_format)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, output_path)
+    return {
+        "proteins": proteins,
+        "output_bytes": size,
+        "seconds": time.perf_counter() - start_time,
+        "filters": [{"name": substitution_filter.name, "substitutions_in": substitution_filter.substitutions_in,
+                     "removed": substitution_filter.removed, "seconds": substitution_filter.seconds}
+                    for substitution_filter in filters]
+    }
 
 if __name__ == "__main__":
-    """Main function to run the post-processing menu."""
     parser = argparse.ArgumentParser(description="Post-process kinase mutation data")
-    parser.add_argument('--input', '-i', type=str, 
+    parser.add_argument('--input', '-i', type=str,
                       default="./data/kinsnps_allinfo_validmutations.json",
-                      help='Path to input JSON file')
-    parser.add_argument('--output', '-o', type=str, 
+                      help='Path to input JSON or JSON Lines file')
+    parser.add_argument('--output', '-o', type=str,
                       default=None,
                       help='Path to output JSON file (defaults to input file with _cleaned suffix)')
-    
+    parser.add_argument('--filters', type=str, default='length',
+                      help=f'Comma-separated filters applied in order: {", ".join(filter_names)} (default: length)')
+    parser.add_argument('--databases', nargs='+', default=None,
+                      help='Databases kept by the database filter, e.g. OMIM ClinVar')
+    parser.add_argument('--format', '-f', choices=json_output_formats, default=None,
+                      help='Output format (default: jsonl for .jsonl outputs, pretty otherwise)')
+    parser.add_argument('--report', type=str, default=None,
+                      help='Also write the run counters as JSON')
     args = parser.parse_args()
     input_file = args.input
-    
+
     # Set default output file if not specified
     if args.output is None:
         base, ext = os.path.splitext(input_file)
         output_file = f"{base}_cleaned{ext}"
     else:
         output_file = args.output
-    
+    output_format = args.format or ('jsonl' if output_file.endswith('.jsonl') else 'pretty')
+
     print(f"Using input file: {input_file}")
     print(f"Using output file: {output_file}")
-    
-    data = load_json_file(input_file)
-    if not data:
-        print("No data loaded. Exiting.")
+
+    if not os.path.exists(input_file):
+        print(f"Error: Could not find file {input_file}")
         exit(1)
-    
-    while True:
-        choice = show_menu()
-        
-        if choice == '1':
-            print("\nCleaning up mutations...")
-            cleaned_data = cleanup_mutations(data)
-            save_json_file(cleaned_data, output_file)
-        elif choice == '0':
-            print("Exiting program.")
-            break
-        else:
-            print("Invalid choice. Please try again.")
\ No newline at end of file
+    try:
+        filters = build_filters([name.strip() for name in args.filters.split(',') if name.strip()], args.databases)
+    except ValueError as e:
+        print(f"Error: {e}")
+        exit(1)
+
+    report = postprocess(input_file, output_file, filters, output_format)
+    print(f"Processed {report['proteins']} proteins in {report['seconds']:.1f}s, "
+          f"wrote {report['output_bytes'] / 1e6:.1f} MB")
+    for substitution_filter in filters:
+        print(substitution_filter.report())
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=4)
@@ -0,0 +1,135 @@
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Iterator, Optional
+
+try:
+    import resource
+except ImportError:  # Windows: no getrusage, RSS and child CPU figures are left out
+    resource = None
+
+page_size_kb = os.sysconf('SC_PAGE_SIZE') // 1024 if hasattr(os, 'sysconf') else 4
+
+def current_rss_kb() -> Optional[int]:
+    """Resident set size of this process, or None where /proc is not available."""
+    try:
+        with open('/proc/self/statm', 'r') as statm:
+            return int(statm.read().split()[1]) * page_size_kb
+    except (OSError, ValueError, IndexError):
+        return None
+
+def max_rss_kb(children: bool = False) -> Optional[int]:
+    """Peak RSS since the process started; ru_maxrss is in bytes on macOS and in kB elsewhere."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+def children_cpu_seconds() -> Optional[float]:
+    """User and system CPU time of the child processes reaped so far."""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+class RssSampler(threading.Thread):
+    """Background thread recording the highest RSS seen since the last reset()."""
+
+    def __init__(self, interval: float = 0.05):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak_kb = 0
+        self.stopped = threading.Event()
+
+    def reset(self) -> None:
+        self.peak_kb = current_rss_kb() or 0
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            rss = current_rss_kb()
+            if rss is not None and rss > self.peak_kb:
+                self.peak_kb = rss
+
+    def stop(self) -> int:
+        self.stopped.set()
+        return self.peak_kb
+
+class RunProfile:
+    """Wall time, CPU time, peak RSS and counters for each stage of a run.
+
+    stage() is a context manager yielding the stage's counters dict, which the instrumented
+    functions update. With a cprofile_path, cProfile runs during the stages and is dumped by save().
+    """
+
+    def __init__(self, cprofile_path: Optional[str] = None, sample_rss: bool = True):
+        self.started = datetime.now(timezone.utc)
+        self.start_time = time.perf_counter()
+        self.stages = []
+        self.cprofile_path = cprofile_path
+        self.profiler = cProfile.Profile() if cprofile_path else None
+        self.sampler = RssSampler() if sample_rss and current_rss_kb() is not None else None
+        if self.sampler:
+            self.sampler.start()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[Dict]:
+        counters = {}
+        if self.sampler:
+            self.sampler.reset()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        children_start = children_cpu_seconds()
+        if self.profiler:
+            self.profiler.enable()
+        try:
+            yield counters
+        finally:
+            if self.profiler:
+                self.profiler.disable()
+            children = children_cpu_seconds()
+            entry = {
+                "name": name,
+                "seconds": time.perf_counter() - wall_start,
+                "cpu_seconds": time.process_time() - cpu_start,
+                # Worker processes reaped during the stage, e.g. the ClinVar process pool
+                "children_cpu_seconds": children - children_start if children is not None else None,
+                "peak_rss_kb": max(self.sampler.peak_kb, current_rss_kb() or 0) if self.sampler else None,
+                "counters": counters
+            }
+            self.stages.append(entry)
+
+    def report(self) -> Dict:
+        """The run as one JSON-serializable record."""
+        return {
+            "started": self.started.isoformat(timespec='seconds'),
+            "argv": sys.argv,
+            "python": sys.version.split()[0],
+            "seconds": time.perf_counter() - self.start_time,
+            "max_rss_kb": max_rss_kb(),
+            "children_max_rss_kb": max_rss_kb(children=True),
+            "stages": self.stages
+        }
+
+    def format(self) -> str:
+        lines = [f"{'stage':<10}{'wall':>9}{'cpu':>9}{'peak rss':>12}  counters"]
+        for entry in self.stages:
+            peak = f"{entry['peak_rss_kb'] / 1024:.0f} MB" if entry["peak_rss_kb"] is not None else '-'
+            counters = ', '.join(f"{name}={value}" for name, value in entry["counters"].items())
+            lines.append(f"{entry['name']:<10}{entry['seconds']:>8.2f}s{entry['cpu_seconds']:>8.2f}s{peak:>12}  {counters}")
+        return '\n'.join(lines)
+
+    def save(self, report_path: Optional[str] = None) -> Dict:
+        """Stop sampling, append the report as one JSON line to report_path and dump the cProfile stats."""
+        if self.sampler:
+            self.sampler.stop()
+        report = self.report()
+        if report_path:
+            with open(report_path, 'a') as report_file:
+                report_file.write(json.dumps(report) + '\n')
+        if self.profiler:
+            self.profiler.dump_stats(self.cprofile_path)
+        return report
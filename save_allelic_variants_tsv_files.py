@@ -1,29 +1,35 @@
 import os
-import requests
 import csv
 from dotenv import load_dotenv
 import time
 import random
+import argparse
+import asyncio
+import aiohttp
+from http_cache import cached_get, default_cache
 
 load_dotenv()
 api_key = os.getenv('OMIM_API_KEY')
 
+omim_base_url = "https://omim.org"
+allelic_variants_dir = './data/allelic_variants/'
+
+headers = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1'
+}
+
 # Function to download and save allelic variants TSV file
 def save_allelic_variants(mim_number):
-    url = f"https://omim.org/allelicVariants/{mim_number}?format=tsv&apiKey={api_key}"
-    
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-        'Accept-Language': 'en-US,en;q=0.5',
-        'Accept-Encoding': 'gzip, deflate, br',
-        'Connection': 'keep-alive',
-        'Upgrade-Insecure-Requests': '1'
-    }
-    
-    response = requests.get(url, headers=headers)
+    url = f"{omim_base_url}/allelicVariants/{mim_number}?format=tsv&apiKey={api_key}"
+
+    response = cached_get(url, headers=headers)
     if response.status_code == 200:
-        directory = './data/allelic_variants/'
+        directory = allelic_variants_dir
         if not os.path.exists(directory):
             os.makedirs(directory)
         filename = f"{directory}{mim_number}.tsv"
@@ -36,14 +42,126 @@ def save_allelic_variants(mim_number):
         print(f"Failed to retrieve data for MIM number {mim_number}: Status code {response.status_code}")
     return None
 
+def is_valid_tsv(filename):
+    """Check that a previously downloaded file is a complete OMIM allelic variants export."""
+    try:
+        with open(filename, 'r') as f:
+            return f.readline().startswith("OMIM Allelic Variants")
+    except (FileNotFoundError, UnicodeDecodeError):
+        return False
+
+class TokenBucket:
+    """Async token bucket: `rate` requests per second with bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+async def fetch_allelic_variants(session, mim_number, bucket, semaphore, directory=allelic_variants_dir,
+                                 base_url=omim_base_url, max_retries=5, backoff=1.0):
+    """Download one allelic variants TSV, retrying with backoff on 429 and 5xx responses."""
+    url = f"{base_url}/allelicVariants/{mim_number}"
+    params = {'format': 'tsv', 'apiKey': api_key or ''}
+    filename = f"{directory}{mim_number}.tsv"
+
+    cached = default_cache.lookup(url, params)
+    if cached is not None:
+        with open(filename, 'w') as f:
+            f.write(cached.text)
+        return filename
+
+    async with semaphore:
+        for attempt in range(max_retries + 1):
+            await bucket.acquire()
+            try:
+                async with session.get(url, params=params) as response:
+                    if response.status == 200:
+                        body = await response.read()
+                        encoding = response.get_encoding()
+                        text = body.decode(encoding, errors='replace')
+                        default_cache.store(url, params, response.status, response.headers, body, encoding)
+                        tmp_filename = f"{filename}.part"
+                        with open(tmp_filename, 'w') as f:
+                            f.write(text)
+                        os.replace(tmp_filename, filename)
+                        return filename
+                    if response.status == 403:
+                        print(f"Access forbidden for MIM number {mim_number}: {await response.text()}")
+                        return None
+                    if response.status != 429 and response.status < 500:
+                        print(f"Failed to retrieve data for MIM number {mim_number}: Status code {response.status}")
+                        return None
+                    retry_after = response.headers.get('Retry-After', '')
+                    delay = float(retry_after) if retry_after.isdigit() else backoff * 2 ** attempt
+                    status = f"Status code {response.status}"
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                delay = backoff * 2 ** attempt
+                status = str(e) or type(e).__name__
+            if attempt < max_retries:
+                print(f"Retrying MIM number {mim_number} in {delay:.1f}s ({status})")
+                await asyncio.sleep(delay + random.uniform(0, backoff))
+        print(f"Giving up on MIM number {mim_number} after {max_retries + 1} attempts ({status})")
+        return None
+
+async def download_allelic_variants(mim_numbers, concurrency=4, rate=4.0, directory=allelic_variants_dir,
+                                    base_url=omim_base_url, max_retries=5, backoff=1.0):
+    """Download all missing or invalid TSV files over one pooled session and return the saved files."""
+    os.makedirs(directory, exist_ok=True)
+    pending = [mim for mim in mim_numbers if not is_valid_tsv(f"{directory}{mim}.tsv")]
+    print(f"Skipping {len(mim_numbers) - len(pending)} existing files, downloading {len(pending)}")
+
+    bucket = TokenBucket(rate)
+    semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(total=60)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=headers) as session:
+        results = await asyncio.gather(*(
+            fetch_allelic_variants(session, mim, bucket, semaphore, directory, base_url, max_retries, backoff)
+            for mim in pending
+        ))
+    return [filename for filename in results if filename]
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download OMIM allelic variants TSV files")
+    parser.add_argument('--concurrency', '-c', type=int, default=4,
+                      help='Maximum number of requests in flight (default: 4)')
+    parser.add_argument('--rate', '-r', type=float, default=4.0,
+                      help='Maximum requests per second sent to OMIM (default: 4)')
+    parser.add_argument('--base-url', type=str, default=omim_base_url,
+                      help='OMIM base URL, e.g. a local stub server for testing')
+    parser.add_argument('--sequential', action='store_true',
+                      help='Use the old one-request-at-a-time downloader with a 1-3 second delay')
+    args = parser.parse_args()
+
     # Read the omim_ids.csv file
     with open('./data/omim_ids.csv', 'r') as csvfile:
         reader = csv.DictReader(csvfile)
         omim_entries = [row for row in reader]
+    mim_numbers = [row["mimNumber"] for row in omim_entries if row["mimNumber"] != "Not Found"]  # Ensure mimNumber is valid
 
-    # Save TSV files
-    for row in omim_entries:
-        if row["mimNumber"] != "Not Found":  # Ensure mimNumber is valid
+    if args.sequential:
+        omim_base_url = args.base_url
+        # Save TSV files
+        for mim_number in mim_numbers:
             time.sleep(random.uniform(1, 3))  # Randomized delay between 1 and 3 seconds
-            save_allelic_variants(row["mimNumber"])
\ No newline at end of file
+            save_allelic_variants(mim_number)
+        print(default_cache.report())
+    else:
+        start_time = time.perf_counter()
+        saved = asyncio.run(download_allelic_variants(mim_numbers, args.concurrency, args.rate, base_url=args.base_url))
+        print(f"Saved {len(saved)} files in {time.perf_counter() - start_time:.1f}s")
+        print(default_cache.report())
@@ -1,4 +1,4 @@
-import requests
+from http_cache import cached_get
 
 def get_uniprot_id(protein_sequence):
     url = "https://www.uniprot.org/uniprot/"
@@ -7,7 +7,7 @@ def get_uniprot_id(protein_sequence):
         'format': 'tab',
         'columns': 'id'
     }
-    response = requests.get(url, params=params)
+    response = cached_get(url, params=params)
     
     if response.status_code == 200:
         lines = response.text.splitlines()
@@ -0,0 +1,122 @@
+import os
+import pickle
+import argparse
+from typing import Dict, Iterator, List, Optional
+
+from alignment_cache import file_fingerprint
+from kinsnps_allinfo import iter_proteins, substitution_sources
+
+index_cache_version = 2  # Bump when SubstitutionIndex changes so persisted indexes are rebuilt
+
+def index_cache_path(json_file_path: str) -> str:
+    """The index is stored next to the output it was built from."""
+    return f"{json_file_path}.index.pickle"
+
+def load_index_cache(json_file_path: str) -> Optional[Dict]:
+    """Return the persisted index data, or None if it is missing, outdated or the output changed."""
+    try:
+        with open(index_cache_path(json_file_path), 'rb') as file:
+            cached = pickle.load(file)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+        return None
+    if not isinstance(cached, dict) or cached.get("version") != index_cache_version:
+        return None
+    fingerprint = file_fingerprint(json_file_path)
+    if fingerprint is None or cached.get("sha256") != fingerprint["sha256"]:
+        return None
+    return cached["data"]
+
+def save_index_cache(json_file_path: str, data: Dict) -> None:
+    cache_path = index_cache_path(json_file_path)
+    cached = {"version": index_cache_version, "sha256": file_fingerprint(json_file_path)["sha256"], "data": data}
+    try:
+        with open(f"{cache_path}.tmp", 'wb') as file:
+            pickle.dump(cached, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f"{cache_path}.tmp", cache_path)
+    except OSError as e:
+        print(f"Warning: Could not write index {cache_path}: {e}")
+
+class SubstitutionIndex:
+    """Hash lookups over every substitution of a kinsnps_allinfo output.
+
+    records holds (uniprot_id, full_sequence_pos, alignment_pos, from, to, location, sources) tuples,
+    where sources is a tuple of (database, count) pairs (one pair for records that were not merged);
+    the dicts map lookup keys to positions in records, in output order.
+    """
+
+    def __init__(self):
+        self.records = []
+        self.by_change = {}  # (uniprot_id, from, to, full_sequence_pos) -> [record]
+        self.by_residues = {}  # (uniprot_id, from, to) -> [record]
+        self.by_alignment = {}  # (uniprot_id, alignment_pos) -> [record]
+
+    @classmethod
+    def build(cls, proteins: Iterator[Dict]) -> 'SubstitutionIndex':
+        index = cls()
+        for protein in proteins:
+            uniprot_id = protein["uniprot_id"]
+            for sub in protein["substitutions"]:
+                position = len(index.records)
+                sources = tuple((source["database"], source["count"]) for source in substitution_sources(sub))
+                index.records.append((uniprot_id, sub["full_sequence_pos"], sub["alignment_pos"], sub["from"],
+                                      sub["to"], sub.get("location"), sources))
+                index.by_change.setdefault((uniprot_id, sub["from"], sub["to"], sub["full_sequence_pos"]), []).append(position)
+                index.by_residues.setdefault((uniprot_id, sub["from"], sub["to"]), []).append(position)
+                index.by_alignment.setdefault((uniprot_id, sub["alignment_pos"]), []).append(position)
+        return index
+
+    @classmethod
+    def load(cls, json_file_path: str, use_cache: bool = True) -> 'SubstitutionIndex':
+        """Load the persisted index of an output file, rebuilding and saving it when the output changed."""
+        if use_cache:
+            cached = load_index_cache(json_file_path)
+            if cached is not None:
+                index = cls()
+                index.__dict__.update(cached)
+                return index
+        index = cls.build(iter_proteins(json_file_path))
+        if use_cache:
+            save_index_cache(json_file_path, index.__dict__)
+        return index
+
+    def find(self, uniprot_id: str, from_aa: str, to_aa: str, full_sequence_pos: int) -> List[tuple]:
+        return [self.records[i] for i in self.by_change.get((uniprot_id, from_aa, to_aa, full_sequence_pos), [])]
+
+    def with_residues(self, uniprot_id: str, from_aa: str, to_aa: str) -> List[tuple]:
+        return [self.records[i] for i in self.by_residues.get((uniprot_id, from_aa, to_aa), [])]
+
+    def at_alignment(self, uniprot_id: str, alignment_pos) -> List[tuple]:
+        return [self.records[i] for i in self.by_alignment.get((uniprot_id, alignment_pos), [])]
+
+def parse_position(value: str):
+    """Alignment positions are ints, or the "Outside of the alignment" marker."""
+    return int(value) if value.lstrip('-').isdigit() else value
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query substitutions of a kinsnps_allinfo output through its index")
+    parser.add_argument('--input', '-i', type=str, default='./data/kinsnps_allinfo_twodbs.json',
+                      help='JSON or JSON Lines output of kinsnps_allinfo.py (default: ./data/kinsnps_allinfo_twodbs.json)')
+    parser.add_argument('--change', '-c', nargs=4, metavar=('UNIPROT_ID', 'FROM', 'TO', 'POS'),
+                      help='Substitutions with these residues at this full sequence position')
+    parser.add_argument('--alignment', '-a', nargs=2, metavar=('UNIPROT_ID', 'ALIGNMENT_POS'),
+                      help='Substitutions of a protein at an alignment position')
+    parser.add_argument('--rebuild', action='store_true',
+                      help='Ignore the persisted index and rebuild it')
+    args = parser.parse_args()
+
+    if args.rebuild:
+        index = SubstitutionIndex.build(iter_proteins(args.input))
+        save_index_cache(args.input, index.__dict__)
+    else:
+        index = SubstitutionIndex.load(args.input)
+    print(f"Indexed {len(index.records)} substitutions")
+
+    matches = []
+    if args.change:
+        uniprot_id, from_aa, to_aa, pos = args.change
+        matches = index.find(uniprot_id, from_aa, to_aa, int(pos))
+    elif args.alignment:
+        matches = index.at_alignment(args.alignment[0], parse_position(args.alignment[1]))
+    for record in matches:
+        sources = ','.join(f"{database}:{count}" for database, count in record[-1])
+        print('\t'.join(str(field) for field in record[:-1]) + f"\t{sources}")
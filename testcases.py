@@ -1,59 +1,71 @@
-import json
-
-def check_substitution(data, results, uniprot_id, from_aa, to_aa, fullseq_pos, alignment_pos):
-    found = False
-    for entry in data:
-        if entry["uniprot_id"] == uniprot_id:
-            for sub in entry["substitutions"]:
-                if sub["from"] == from_aa and sub["to"] == to_aa:
-                    if sub["full_sequence_pos"] == fullseq_pos and sub["alignment_pos"] == alignment_pos:
-                        results["passed"].append(f"{uniprot_id}: Passed for {from_aa} to {to_aa} at fullseq_pos {fullseq_pos} and alignment_pos {alignment_pos}")
-                        found = True
-                        return  # Found exact match
-                    elif not found:  # Only record failure if no match found yet
-                        if sub["full_sequence_pos"] != fullseq_pos:
-                            results["failed"].append(f"{uniprot_id}: Expected full_sequence_pos {fullseq_pos}, got {sub['full_sequence_pos']}")
-                        if sub["alignment_pos"] != alignment_pos:
-                            results["failed"].append(f"{uniprot_id}: Expected alignment_pos {alignment_pos}, got {sub['alignment_pos']}")
-                        found = True  # Mark as found even if positions don't match
-    
-    if not found:
+import csv
+import argparse
+
+from substitution_index import SubstitutionIndex, parse_position
+
+cases_file_path = './data/testcases.csv'
+
+def check_substitution(index, results, uniprot_id, from_aa, to_aa, fullseq_pos, alignment_pos):
+    if any(record[2] == alignment_pos for record in index.find(uniprot_id, from_aa, to_aa, fullseq_pos)):
+        results["passed"].append(f"{uniprot_id}: Passed for {from_aa} to {to_aa} at fullseq_pos {fullseq_pos} and alignment_pos {alignment_pos}")
+        return  # Found exact match
+
+    candidates = index.with_residues(uniprot_id, from_aa, to_aa)
+    if not candidates:
         results["failed"].append(f"{uniprot_id}: Entry with specified substitutions not found for {from_aa} to {to_aa}")
+        return
+
+    # Report the differences against the first substitution with the same residues
+    _, full_sequence_pos, found_alignment_pos = candidates[0][:3]
+    if full_sequence_pos != fullseq_pos:
+        results["failed"].append(f"{uniprot_id}: Expected full_sequence_pos {fullseq_pos}, got {full_sequence_pos}")
+    if found_alignment_pos != alignment_pos:
+        results["failed"].append(f"{uniprot_id}: Expected alignment_pos {alignment_pos}, got {found_alignment_pos}")
+
+def load_cases(cases_path=cases_file_path):
+    """Read expected (uniprot_id, from, to, full_sequence_pos, alignment_pos) cases from a CSV file."""
+    with open(cases_path, 'r', newline='') as csvfile:
+        return [(row['uniprot_id'], row['from'], row['to'], int(row['full_sequence_pos']),
+                 parse_position(row['alignment_pos'])) for row in csv.DictReader(csvfile)]
 
-def test_output_json(json_file_path):
+def test_output_json(json_file_path, cases_path=cases_file_path):
     results = {"passed": [], "failed": []}
-    
+
     try:
-        with open(json_file_path, 'r') as f:
-            data = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError) as e:
+        index = SubstitutionIndex.load(json_file_path)
+    except (FileNotFoundError, ValueError) as e:  # json.JSONDecodeError is a ValueError
         results["failed"].append(f"Error reading JSON file: {str(e)}")
         return results
 
-    check_substitution(data, results, "Q16644", "L", "P", 173, 126)
-    check_substitution(data, results, "Q8IW41", "G", "V", 107, 79)
-    check_substitution(data, results, "P68400", "R", "Q", 47, 9)
-    check_substitution(data, results, "P68400", "D", "H", 156, 119)
-    check_substitution(data, results, "P68400", "K", "R", 198, 160)
-    check_substitution(data, results, "P43405", "S", "Y", 550, 171)
-    check_substitution(data, results, "P10721", "R", "G", 796, 123)
-    check_substitution(data, results, "P10721", "E", "K", 839, 163)
+    for case in load_cases(cases_path):
+        check_substitution(index, results, *case)
 
     return results
 
 if __name__ == "__main__":
-    results = test_output_json('kinsnps_allinfo.json')
-    
+    parser = argparse.ArgumentParser(description="Check expected substitutions in a kinsnps_allinfo output")
+    parser.add_argument('--input', '-i', type=str, default='./data/kinsnps_allinfo_twodbs.json',
+                      help='JSON or JSON Lines output to check (default: ./data/kinsnps_allinfo_twodbs.json)')
+    parser.add_argument('--cases', '-c', type=str, default=cases_file_path,
+                      help=f'CSV of expected cases (default: {cases_file_path})')
+    parser.add_argument('--failures-only', action='store_true',
+                      help='Only list failed cases, for large golden-case suites')
+    args = parser.parse_args()
+
+    results = test_output_json(args.input, args.cases)
+
     print("\nTest Results:")
-    if results["passed"]:
+    if results["passed"] and not args.failures_only:
         print("\nPassed tests:")
         for test in results["passed"]:
             print(f"  ✓ {test}")
-            
+
     if results["failed"]:
         print("\nFailed tests:")
         for test in results["failed"]:
             print(f"  ✗ {test}")
-            
+
     if not results["passed"] and not results["failed"]:
-        print("No tests were executed")
\ No newline at end of file
+        print("No tests were executed")
+    else:
+        print(f"\n{len(results['passed'])} passed, {len(results['failed'])} failed")
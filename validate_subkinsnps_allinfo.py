@@ -1,9 +1,17 @@
 # Validate the `subkinsnps_allinfo.json` file with the following steps:
 # 1. From the Sequence: Delete paranthesis and dashes
 # 2. Find the "from" character that is in the "full_seuqnce_pos" and see if it  corresponds with the "sequence"
-# 3. Check if the "from" corresponds to  the "alignment_pos" in the "kinase_domain_alignment" 
+# 3. Check if the "from" corresponds to  the "alignment_pos" in the "kinase_domain_alignment"
 
 import json
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from kinsnps_allinfo import iter_proteins
 
 # Conversion table for amino acids from 3-letter to 1-letter codes
 amino_acid_map = {
@@ -12,63 +20,153 @@ amino_acid_map = {
     "MET": "M", "PHE": "F", "PRO": "P", "SER": "S", "THR": "T", "TRP": "W",
     "TYR": "Y", "VAL": "V", "ASX": "B", "GLX": "Z"
 }
+# kinsnps_allinfo.py writes one-letter codes, older files used three-letter codes
+residue_codes = {**amino_acid_map, **{code: code for code in amino_acid_map.values()}}
+
+errors_file_path = './data/validation_errors.jsonl'
+cleanup_table = str.maketrans('', '', '()-')
+
+def residue_code(code: str) -> Optional[str]:
+    """One-letter code of a one- or three-letter residue code in any case, or None if it is not a residue."""
+    return residue_codes.get(code.upper())
 
 def remove_parentheses_and_dashes(sequence):
-    return sequence.replace("(", "").replace(")", "").replace("-", "")
+    return sequence.translate(cleanup_table)
+
+def residue_array(sequence: str) -> np.ndarray:
+    """Upper-cased residues as a uint8 array, for comparisons against many positions at once."""
+    return np.frombuffer(sequence.upper().encode('ascii'), dtype=np.uint8)
+
+def lookup_residues(residues: np.ndarray, positions: np.ndarray) -> tuple:
+    """Return (in_range mask, residue codes) for 1-based positions; out of range positions read as 0."""
+    in_range = (positions >= 1) & (positions <= len(residues))
+    found = np.zeros(len(positions), dtype=np.uint8)
+    found[in_range] = residues[positions[in_range] - 1]
+    return in_range, found
+
+def validate_entry(entry: Dict) -> List[Dict]:
+    """Check every substitution of one protein; errors are returned in substitution order."""
+    uniprot_id = entry['uniprot_id']
+    substitutions = entry["substitutions"]
+    if not substitutions:
+        return []
+
+    # Step 1: Clean the sequence by removing parentheses and dashes, once per protein
+    sequence_residues = residue_array(remove_parentheses_and_dashes(entry["sequence"]))
+    expected_codes = [residue_code(substitution["from"]) for substitution in substitutions]
+    expected = np.frombuffer(''.join(code or '?' for code in expected_codes).encode('ascii'), dtype=np.uint8)
+    valid_code = expected != ord('?')
+
+    # Step 2: Validate the 'from' residues with the full sequence
+    full_positions = np.fromiter((substitution["full_sequence_pos"] for substitution in substitutions),
+                                 dtype=np.int64, count=len(substitutions))
+    in_sequence, sequence_found = lookup_residues(sequence_residues, full_positions)
+    sequence_mismatch = valid_code & in_sequence & (sequence_found != expected)
 
-def validate_substitutions(data):
+    # Step 3: Validate the 'from' residues with the kinase domain alignment; positions outside of it are strings
+    alignment_positions = np.fromiter((position if isinstance(position, int) else -1
+                                       for position in (substitution["alignment_pos"] for substitution in substitutions)),
+                                      dtype=np.int64, count=len(substitutions))
+    aligned = alignment_positions >= 0
+    check_alignment = valid_code & in_sequence & aligned & ("kinase_domain" in entry)
+    alignment_mismatch = np.zeros(len(substitutions), dtype=bool)
+    alignment_out_of_range = np.zeros(len(substitutions), dtype=bool)
+    if check_alignment.any():
+        alignment_residues = residue_array(entry["kinase_domain_alignment"]["sequence"])
+        in_alignment, alignment_found = lookup_residues(alignment_residues, alignment_positions)
+        alignment_mismatch = check_alignment & in_alignment & (alignment_found != expected)
+        alignment_out_of_range = check_alignment & ~in_alignment
+
+    has_error = ~valid_code | ~in_sequence | sequence_mismatch | alignment_mismatch | alignment_out_of_range
+    error_indexes = np.flatnonzero(has_error)
+    if not len(error_indexes):
+        return []
+
+    # Plain lists are much faster than numpy scalars in the message loop
+    valid_code, in_sequence = valid_code.tolist(), in_sequence.tolist()
+    sequence_mismatch, sequence_found = sequence_mismatch.tolist(), sequence_found.tolist()
+    alignment_mismatch, alignment_out_of_range = alignment_mismatch.tolist(), alignment_out_of_range.tolist()
+    alignment_found = alignment_found.tolist() if check_alignment.any() else None
     errors = []
+    for i in error_indexes.tolist():
+        substitution = substitutions[i]
+        if not valid_code[i]:
+            errors.append({"UniprotId": uniprot_id, "Error": f"Invalid amino acid code {substitution['from']}"})
+            continue
+        if not in_sequence[i]:
+            errors.append({"UniprotId": uniprot_id, "Error": f"Index out of range in sequence at full_sequence_pos {substitution['full_sequence_pos']}"})
+            continue
+        if sequence_mismatch[i]:
+            errors.append({"UniprotId": uniprot_id, "Error": f"Mismatch in sequence at full_sequence_pos {substitution['full_sequence_pos']}: expected {expected_codes[i]}, found {chr(sequence_found[i])}"})
+        if alignment_out_of_range[i]:
+            errors.append({"UniprotId": uniprot_id, "Error": f"Index out of range in kinase domain alignment at alignment_pos {substitution['alignment_pos']}"})
+        elif alignment_mismatch[i]:
+            errors.append({"UniprotId": uniprot_id, "Error": f"Mismatch in kinase domain alignment at alignment_pos {substitution['alignment_pos']}: expected {expected_codes[i]}, found {chr(alignment_found[i])}"})
+    return errors
+
+def validate_chunk(entries: List[Dict]) -> List[tuple]:
+    return [(entry['uniprot_id'], validate_entry(entry)) for entry in entries]
+
+def iter_chunks(entries: Iterator[Dict], size: int) -> Iterator[List[Dict]]:
+    chunk = []
+    for entry in entries:
+        chunk.append(entry)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def validate_substitutions(data, workers: int = 1, chunk_size: int = 32) -> Iterator[tuple]:
+    """Yield (uniprot_id, errors) per protein in input order, validating chunks of proteins in worker processes."""
+    chunks = iter_chunks(iter(data), chunk_size)
+    if workers <= 1:
+        for chunk in chunks:
+            yield from validate_chunk(chunk)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # map keeps submission order, so the errors file matches the serial run
+        for results in executor.map(validate_chunk, chunks):
+            yield from results
+
+def write_errors(results: Iterator[tuple], errors_path: str, echo: bool = False) -> tuple:
+    """Stream errors to a JSON Lines file; returns (proteins checked, proteins with errors, errors)."""
+    proteins = 0
     uniprot_errors = set()
-    
-    for entry in data:
-        uniprot_id = entry['uniprot_id']
-        # Step 1: Clean the sequence by removing parentheses and dashes
-        cleaned_sequence = remove_parentheses_and_dashes(entry["sequence"])
-        
-        for substitution in entry["substitutions"]:
-            full_sequence_pos = substitution["full_sequence_pos"] - 1  # Convert to 0-based index
-            alignment_pos = substitution["alignment_pos"] - 1  # Convert to 0-based index
-            from_residue = amino_acid_map.get(substitution["from"].upper())
-
-            if not from_residue:
-                errors.append({"UniprotId": uniprot_id, "Error": f"Invalid amino acid code {substitution['from']}"})
+    error_count = 0
+    with open(errors_path, 'w') as errors_file:
+        for uniprot_id, errors in results:
+            proteins += 1
+            for error in errors:
+                errors_file.write(json.dumps(error) + '\n')
+                if echo:
+                    print(error)
+            if errors:
                 uniprot_errors.add(uniprot_id)
-                continue
+                error_count += len(errors)
+    return proteins, len(uniprot_errors), error_count
 
-            # Step 2: Validate the 'from' residue with the full sequence
-            try:
-                sequence_residue = cleaned_sequence[full_sequence_pos]
-            except IndexError:
-                errors.append({"UniprotId": uniprot_id, "Error": f"Index out of range in sequence at full_sequence_pos {substitution['full_sequence_pos']}"})
-                uniprot_errors.add(uniprot_id)
-                continue
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validate substitution residues against the sequences and alignments")
+    parser.add_argument('--input', '-i', type=str, default='./data/kinsnps_allinfo_twodbs.json',
+                      help='JSON or JSON Lines file written by kinsnps_allinfo.py (default: ./data/kinsnps_allinfo_twodbs.json)')
+    parser.add_argument('--errors', '-e', type=str, default=errors_file_path,
+                      help=f'JSON Lines file receiving one error per line (default: {errors_file_path})')
+    parser.add_argument('--workers', '-w', type=int, default=1,
+                      help='Number of processes validating proteins (default: 1)')
+    parser.add_argument('--print', action='store_true',
+                      help='Also print every error, like the old validator')
+    args = parser.parse_args()
 
-            if sequence_residue.upper() != from_residue:
-                errors.append({"UniprotId": uniprot_id, "Error": f"Mismatch in sequence at full_sequence_pos {substitution['full_sequence_pos']}: expected {from_residue}, found {sequence_residue}"})
-                uniprot_errors.add(uniprot_id)
+    start_time = time.perf_counter()
+    proteins, proteins_with_errors, error_count = write_errors(
+        validate_substitutions(iter_proteins(args.input), args.workers), args.errors, args.print)
 
-            # Step 3: Validate the 'from' residue with the kinase domain alignment if applicable
-            if "kinase_domain" in entry:
-                kinase_domain_residue = entry["kinase_domain_alignment"]["sequence"][alignment_pos]
-
-                if kinase_domain_residue.upper() != from_residue:
-                    errors.append({"UniprotId": uniprot_id, "Error": f"Mismatch in kinase domain alignment at alignment_pos {substitution['alignment_pos']}: expected {from_residue}, found {kinase_domain_residue}"})
-                    uniprot_errors.add(uniprot_id)
-    
-    return errors, uniprot_errors
-
-# Load the JSON file
-with open('kinsnps_allinfo.json', 'r') as file:
-    data = json.load(file)
-
-# Perform validation
-errors, uniprot_errors = validate_substitutions(data)
-
-# Output results
-if errors:
-    for error in errors:
-        print(error)
-    print(f"\nTotal UniProts with errors: {len(uniprot_errors)} out of {len(data)}")
-else:
-    print("All substitutions are valid!")
-    print(f"\nTotal UniProts checked: {len(data)}")
\ No newline at end of file
+    # Output results
+    if error_count:
+        print(f"Wrote {error_count} errors to {args.errors}")
+        print(f"\nTotal UniProts with errors: {proteins_with_errors} out of {proteins}")
+    else:
+        print("All substitutions are valid!")
+        print(f"\nTotal UniProts checked: {proteins}")
+    print(f"Validated in {time.perf_counter() - start_time:.1f}s")